@@ -0,0 +1,244 @@
+import calendar
+import os
+
+import numpy as np
+import pandas as pd
+
+from binned_kde import binned_distribution, box_summaries
+from sketches import estimate_distinct, group_sketches, hash_values, merge_sketches, precision_for_error
+
+# Every metric the charts and the Insights section read is declared here. Metrics are
+# computed as partial aggregates that can be merged, so the same code serves a whole
+# frame (compute_metrics) and a file streamed in chunks (ingestion.stream_metrics).
+
+# Additive per-group columns, computed in a single groupby pass per key
+GROUP_METRICS = {
+    'Event Name': {
+        'tickets': ('Ticket ID', 'count'),
+        'revenue': ('Ticket Price', 'sum'),
+        'priced_tickets': ('Ticket Price', 'count'),
+    },
+    'Event Type': {
+        'rows': ('Ticket ID', 'size'),
+        'tickets': ('Ticket ID', 'count'),
+        'revenue': ('Ticket Price', 'sum'),
+        'duration_sum': ('Event Duration', 'sum'),
+        'duration_count': ('Event Duration', 'count'),
+    },
+    'Event Organizer': {
+        'tickets': ('Ticket ID', 'count'),
+    },
+    'Ticket Type': {
+        'rows': ('Ticket ID', 'size'),
+    },
+}
+
+# Distinct values of a column per group, kept as sets so partial results can be merged
+DISTINCT_METRICS = {
+    'attendees_by_event_name': ('Event Name', 'Attendee Name'),
+    'attendees_by_event_type': ('Event Type', 'Attendee Name'),
+    'tickets_by_ticket_type': ('Ticket Type', 'Ticket ID'),
+    'events_by_month': ('Event Month', 'Event Name'),
+    'events_by_organizer_type': (['Event Organizer', 'Event Type'], 'Event Name'),
+}
+
+# Distinct counts that grow with the number of rows. REPORT_DISTINCT_MODE=approximate
+# counts them with mergeable HyperLogLog sketches (see sketches.py) instead of exact sets,
+# to a relative standard error of about REPORT_DISTINCT_ERROR. validate computes both,
+# reports the exact counts and adds their comparison as the distinct_validation metric.
+APPROXIMATE_DISTINCT_METRICS = ['attendees_by_event_name', 'attendees_by_event_type', 'tickets_by_ticket_type']
+DISTINCT_MODE = os.environ.get('REPORT_DISTINCT_MODE', 'exact')
+DISTINCT_ERROR = float(os.environ.get('REPORT_DISTINCT_ERROR', 0.02))
+
+# Row counts per value (or combination of values), merged by adding them up
+VALUE_COUNTS = {
+    'gender_count': 'Attendee Gender',
+    'gender_by_event': ['Event Name', 'Attendee Gender'],
+    'location_counts': 'Attendee Location',
+    'price_counts': 'Ticket Price',
+    'ticket_types_by_event_type': ['Event Type', 'Ticket Type'],
+    'ages_by_event_type': ['Event Type', 'Attendee Age'],
+}
+
+# Partial aggregates each finalized metric is built from: ('groups', GROUP_METRICS key),
+# ('distinct', DISTINCT_METRICS name), ('counts', VALUE_COUNTS name) or ('totals', None)
+METRIC_INPUTS = {
+    'by_event_name': [('groups', 'Event Name'), ('distinct', 'attendees_by_event_name')],
+    'by_event_type': [('groups', 'Event Type'), ('distinct', 'attendees_by_event_type')],
+    'by_organizer': [('groups', 'Event Organizer')],
+    'by_ticket_type': [('groups', 'Ticket Type'), ('distinct', 'tickets_by_ticket_type')],
+    'gender_count': [('counts', 'gender_count')],
+    'gender_by_event': [('counts', 'gender_by_event')],
+    'events_by_month': [('distinct', 'events_by_month')],
+    'events_by_organizer_type': [('distinct', 'events_by_organizer_type')],
+    'location_counts': [('counts', 'location_counts')],
+    'total_revenue': [('totals', None)],
+    'min_price': [('totals', None)],
+    'max_price': [('totals', None)],
+    'price_counts': [('counts', 'price_counts')],
+    'price_histogram': [('counts', 'price_counts')],
+    'ticket_types_by_event_type': [('counts', 'ticket_types_by_event_type')],
+    'ages_by_event_type': [('counts', 'ages_by_event_type')],
+    'age_summaries': [('counts', 'ages_by_event_type')],
+}
+
+
+def plan_partial(metrics=None):
+    # The partial aggregates needed for the named metrics (all of them when metrics is None)
+    plan = {'groups': set(), 'distinct': set(), 'counts': set(), 'totals': set()}
+    for metric in METRIC_INPUTS if metrics is None else metrics:
+        for kind, name in METRIC_INPUTS[metric]:
+            plan[kind].add(name)
+    return plan
+
+
+def partial_metrics(df, metrics=None):
+    # Only the aggregates the named metrics need are computed (see METRIC_INPUTS)
+    plan = plan_partial(metrics)
+    partial = {'groups': {}, 'distinct': {}, 'sketches': {}, 'counts': {}}
+    hashes = {}
+    for key, group_metrics in GROUP_METRICS.items():
+        if key in plan['groups']:
+            partial['groups'][key] = df.groupby(key, observed=True).agg(**group_metrics)
+    for name, (key, column) in DISTINCT_METRICS.items():
+        if name not in plan['distinct']:
+            continue
+        sketched = DISTINCT_MODE != 'exact' and name in APPROXIMATE_DISTINCT_METRICS
+        if sketched:
+            # Sketches of the same column share its hashes
+            if column not in hashes:
+                hashes[column] = hash_values(df[column])
+            partial['sketches'][name] = group_sketches(df, key, column, precision_for_error(DISTINCT_ERROR),
+                                                       hashes[column])
+        if not sketched or DISTINCT_MODE == 'validate':
+            # An empty frame gives a categorical result that can't hold sets
+            partial['distinct'][name] = df.groupby(key, observed=True)[column].unique().astype(object).map(set)
+    for name, columns in VALUE_COUNTS.items():
+        if name in plan['counts']:
+            partial['counts'][name] = df.groupby(columns, observed=True).size()
+    if plan['totals']:
+        partial['totals'] = {
+            'revenue': df['Ticket Price'].sum(),
+            'min_price': df['Ticket Price'].min(),
+            'max_price': df['Ticket Price'].max(),
+        }
+    return partial
+
+
+def _merge_sets(left, right):
+    combined = pd.concat([left, right])
+    return combined.groupby(level=list(range(combined.index.nlevels)), observed=True).agg(lambda sets: set().union(*sets))
+
+
+def merge_partial_metrics(left, right):
+    # Both partials must have been computed for the same metrics
+    merged = {
+        'groups': {key: left['groups'][key].add(right['groups'][key], fill_value=0) for key in left['groups']},
+        'distinct': {name: _merge_sets(left['distinct'][name], right['distinct'][name]) for name in left['distinct']},
+        'sketches': {name: merge_sketches(left['sketches'][name], right['sketches'][name])
+                     for name in left.get('sketches', {})},
+        'counts': {name: left['counts'][name].add(right['counts'][name], fill_value=0) for name in left['counts']},
+    }
+    if 'totals' in left:
+        merged['totals'] = {
+            'revenue': left['totals']['revenue'] + right['totals']['revenue'],
+            # fmin/fmax ignore the NaN of a partial that had no priced rows
+            'min_price': np.fmin(left['totals']['min_price'], right['totals']['min_price']),
+            'max_price': np.fmax(left['totals']['max_price'], right['totals']['max_price']),
+        }
+    return merged
+
+
+def finalize_metrics(partial, metrics=None):
+    # Turns merged partial aggregates into the metrics dict shared by the chart tasks
+    # and the report text. Only the named metrics are built (all of them when None);
+    # partial must hold their inputs.
+    wanted = set(METRIC_INPUTS if metrics is None else metrics)
+    groups = partial['groups']
+    distinct = {name: sets.map(len) for name, sets in partial['distinct'].items()}
+    # Sources that count distinct values themselves (see event_store.py) give the counts
+    distinct.update(partial.get('distinct_counts', {}))
+    validation = {}
+    for name, sketches in partial.get('sketches', {}).items():
+        approximate = estimate_distinct(sketches)
+        if name in distinct:
+            validation[name] = pd.DataFrame({
+                'exact': distinct[name],
+                'approximate': approximate,
+                'relative_error': (approximate - distinct[name]) / distinct[name],
+            })
+        else:
+            distinct[name] = approximate
+    counts = {name: series.astype('int64') for name, series in partial['counts'].items()}
+    metrics = {}
+
+    if 'by_event_name' in wanted:
+        by_event_name = groups['Event Name']
+        metrics['by_event_name'] = pd.DataFrame({
+            'tickets': by_event_name['tickets'].astype('int64'),
+            'revenue': by_event_name['revenue'],
+            'avg_price': by_event_name['revenue'] / by_event_name['priced_tickets'],
+            'attendees': distinct['attendees_by_event_name'],
+        })
+
+    if 'by_event_type' in wanted:
+        by_event_type = groups['Event Type']
+        metrics['by_event_type'] = pd.DataFrame({
+            'rows': by_event_type['rows'].astype('int64'),
+            'tickets': by_event_type['tickets'].astype('int64'),
+            'revenue': by_event_type['revenue'],
+            'attendees': distinct['attendees_by_event_type'],
+            'avg_duration': by_event_type['duration_sum'] / by_event_type['duration_count'],
+        })
+
+    if 'by_organizer' in wanted:
+        metrics['by_organizer'] = pd.DataFrame({
+            'tickets': groups['Event Organizer']['tickets'].astype('int64'),
+        })
+
+    if 'by_ticket_type' in wanted:
+        metrics['by_ticket_type'] = pd.DataFrame({
+            'rows': groups['Ticket Type']['rows'].astype('int64'),
+            'distinct_tickets': distinct['tickets_by_ticket_type'],
+        })
+
+    if 'gender_count' in wanted:
+        metrics['gender_count'] = counts['gender_count'].sort_values(ascending=False)
+    if 'gender_by_event' in wanted:
+        metrics['gender_by_event'] = counts['gender_by_event'].unstack()
+
+    if 'events_by_month' in wanted:
+        # Distinct events held per month, labelled with the month name
+        events_by_month = distinct['events_by_month']
+        events_by_month.index = [calendar.month_name[int(month)] for month in events_by_month.index]
+        metrics['events_by_month'] = events_by_month
+
+    if 'events_by_organizer_type' in wanted:
+        metrics['events_by_organizer_type'] = distinct['events_by_organizer_type']
+    if 'location_counts' in wanted:
+        metrics['location_counts'] = counts['location_counts'].sort_values(ascending=False)
+
+    for name in ['total_revenue', 'min_price', 'max_price']:
+        if name in wanted:
+            metrics[name] = partial['totals']['revenue' if name == 'total_revenue' else name]
+
+    # Value counts behind the charts that plot distributions
+    if 'price_counts' in wanted:
+        metrics['price_counts'] = counts['price_counts'].sort_index()
+    if 'price_histogram' in wanted:
+        # Histogram and density curve of the price chart, binned from the value counts
+        metrics['price_histogram'] = binned_distribution(counts['price_counts'])
+    for name in ['ticket_types_by_event_type', 'ages_by_event_type']:
+        if name in wanted:
+            metrics[name] = counts[name]
+    if 'age_summaries' in wanted:
+        # Five-number summaries per event type behind the age boxplot
+        metrics['age_summaries'] = box_summaries(counts['ages_by_event_type'])
+
+    if validation:
+        metrics['distinct_validation'] = validation
+    return metrics
+
+
+def compute_metrics(df, metrics=None):
+    return finalize_metrics(partial_metrics(df, metrics), metrics)
@@ -1,30 +1,144 @@
-from flask import Flask, render_template, send_file, jsonify
-from report_generator import generate_report
+from flask import Flask, Response, render_template, request, send_file, jsonify, url_for
+from artifacts import artifact_etag, artifact_path
+from instrumentation import prometheus_metrics
+from jobs import submit_report_job, get_job, latest_finished_job, get_summaries, warm_up_workers, JobQueueFull
+from report_filters import parse_report_filters
+from report_spec import SECTIONS, parse_sections
 import os
 
 app = Flask(__name__)
 
+# Versioned report URLs never change content, so clients may keep them for a year
+ARTIFACT_MAX_AGE = 365 * 24 * 3600
+
+
+def send_report(pdf_path, immutable=False):
+    # Serves a published report with its content hash as ETag. send_file answers
+    # If-None-Match / If-Modified-Since with 304 and Range requests with 206.
+    try:
+        response = send_file(pdf_path, as_attachment=True, download_name='event_data_analysis_report.pdf',
+                             etag=artifact_etag(pdf_path) or True, conditional=True,
+                             max_age=ARTIFACT_MAX_AGE if immutable else None)
+    except FileNotFoundError:
+        return 'Report file not found', 404
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        # The latest report changes over time; clients revalidate with the ETag
+        response.cache_control.no_cache = True
+    return response
+
+
 @app.route('/')
 def index():
+    # Start the report workers while the page is open, before the first report is requested
+    warm_up_workers()
     return render_template('index.html')
 
 @app.route('/generate_report', methods=['POST'])
 def create_report():
+    # Optional filters (event_type, organizer, start_date, ...) and the report sections to
+    # include (sections=demographics,insights) come as JSON or form fields
+    body = request.get_json(silent=True)
+    if body is not None and not isinstance(body, dict):
+        return jsonify({"status": "error", "message": "The request body must be a JSON object"}), 400
+    params = dict(body or request.form.to_dict(flat=False))
+    try:
+        sections = parse_sections(params.pop('sections', None))
+        filters = parse_report_filters(params)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     try:
-        pdf_path = generate_report()
-        return jsonify({"status": "success", "message": "Report generated successfully"})
+        job_id = submit_report_job(filters, sections)
+    except JobQueueFull as e:
+        app.logger.warning(f"Rejected report job: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
-        app.logger.error(f"Error generating report: {str(e)}")
+        app.logger.error(f"Error queueing report: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "report_url": url_for('job_report', job_id=job_id),
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "created_at": job['created_at'],
+        "finished_at": job['finished_at'],
+        "message": job['error'],
+        "report_url": url_for('job_report', job_id=job_id) if job['status'] == 'finished' else None,
+        "artifact_url": url_for('report_artifact', name=os.path.basename(job['pdf_path']))
+        if job['status'] == 'finished' else None,
+        "stages": job['stages'],
+        "requests": job['requests'],
+    })
+
+
+@app.route('/jobs/<job_id>/report')
+def job_report(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return 'Job not found', 404
+    if job['status'] == 'failed':
+        return 'Report generation failed', 404
+    if job['status'] != 'finished':
+        return 'Report is not ready yet', 409
+    return send_report(job['pdf_path'])
+
+
+@app.route('/reports/<name>')
+def report_artifact(name):
+    # Versioned report, named by its content hash
+    path = artifact_path(name)
+    if path is None:
+        return 'Report file not found', 404
+    return send_report(path, immutable=True)
 
 
 @app.route('/download_report')
 def download_report():
-    pdf_path = 'Report/event_data_analysis_report.pdf'
-    try:
-        return send_file(pdf_path, as_attachment=True)
-    except FileNotFoundError:
+    # Serves the most recently finished report
+    job = latest_finished_job()
+    if job is None:
         return 'Report file not found', 404
+    return send_report(job['pdf_path'])
+
+def section_response(name):
+    # Values quoted in a report section, served from the summaries kept for the current CSV
+    try:
+        summaries = get_summaries()
+    except Exception as e:
+        app.logger.error(f"Error computing report summary: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"section": name, "heading": SECTIONS[name]['heading'], "values": summaries[name]})
+
+@app.route('/api/summary')
+def summary():
+    # The Insights numbers of the report (total revenue, most popular event, ...)
+    return section_response('insights')
+
+@app.route('/api/sections/<name>')
+def section_summary(name):
+    if name not in SECTIONS:
+        return jsonify({"status": "error", "message": f"Unknown report section: {name}"}), 404
+    return section_response(name)
+
+@app.route('/metrics')
+def metrics():
+    # Per-stage report generation metrics in the Prometheus text format
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # With the debug reloader, only the child process that serves requests starts workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up_workers()
+    app.run(debug=True)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import re
+import shutil
+
+from storage import atomic_write
+
+# Finished reports are published under a name derived from their content hash. A published
+# file is never modified, so its name doubles as its ETag, it can be cached by clients
+# indefinitely, and a download can never see a report that is still being written.
+
+# Absolute, so published paths don't depend on the working directory (Flask's send_file
+# resolves relative paths against the app folder)
+ARTIFACTS_FOLDER = os.path.abspath(os.environ.get('REPORT_ARTIFACTS_FOLDER', 'Artifacts'))
+# Number of published reports kept, newest first
+MAX_ARTIFACTS = int(os.environ.get('REPORT_MAX_ARTIFACTS', 50))
+
+ARTIFACT_NAME = re.compile(r'^event_data_analysis_report_([0-9a-f]{20})\.pdf$')
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def publish_report(pdf_path):
+    # Copies pdf_path into ARTIFACTS_FOLDER under its content hash and returns the new path
+    os.makedirs(ARTIFACTS_FOLDER, exist_ok=True)
+    artifact_path = os.path.join(ARTIFACTS_FOLDER, f'event_data_analysis_report_{_file_digest(pdf_path)}.pdf')
+    try:
+        # Same content as an earlier report; mark it as recently published
+        os.utime(artifact_path)
+    except FileNotFoundError:
+        # New, or just pruned by another worker
+        with atomic_write(artifact_path) as tmp_path:
+            shutil.copyfile(pdf_path, tmp_path)
+    prune_artifacts()
+    return artifact_path
+
+
+def prune_artifacts(max_artifacts=MAX_ARTIFACTS):
+    # Removes the least recently published reports beyond max_artifacts
+    published = []
+    for entry in os.scandir(ARTIFACTS_FOLDER):
+        if not ARTIFACT_NAME.match(entry.name):
+            continue
+        try:
+            published.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            # Pruned by another worker in the meantime
+            continue
+    published.sort(reverse=True)
+    for _, path in published[max_artifacts:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def artifact_etag(artifact_path):
+    # The content hash in the file name, or None for a path that isn't a published report
+    match = ARTIFACT_NAME.match(os.path.basename(artifact_path))
+    return match.group(1) if match else None
+
+
+def artifact_path(name):
+    # Path of the published report called name, or None if name isn't a report file name
+    if not ARTIFACT_NAME.match(name):
+        return None
+    return os.path.join(ARTIFACTS_FOLDER, name)
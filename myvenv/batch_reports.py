@@ -0,0 +1,98 @@
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from cube import filtered_metrics, partition_filters
+from dataset_cache import load_cached_cube
+from ingestion import DEFAULT_DATA_PATH
+from instrumentation import span
+from report_filters import GENDER_CODES
+from report_generator import render_report
+from report_spec import parse_sections, required_metrics
+
+# Writes one report per value of a column (by default one per organizer). The CSV is
+# loaded, cleaned and aggregated into the report cube once; each report's metrics are a
+# slice of that cube, and the reports are drawn and written by a pool of worker processes.
+#
+#   python batch_reports.py --by organizer --output Report/by_organizer
+
+# Reports split by a column go to <folder>/by_<column>/ unless an output folder is given
+BATCH_REPORT_FOLDER = 'Report'
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(value)).strip('_')
+
+
+def default_output_folder(partition_by):
+    # e.g. Report/by_organizer, Report/by_event_type, Report/by_event_month
+    return os.path.join(BATCH_REPORT_FOLDER, f'by_{_slug(partition_by).lower()}')
+
+
+def _folder_name(dimension, value):
+    if dimension == 'Attendee Gender':
+        value = {code: name for name, code in GENDER_CODES.items()}[value]
+    elif hasattr(value, 'date'):
+        value = value.date()
+    return _slug(value) or 'blank'
+
+
+def _render_partition(metrics, report_folder, charts_folder, pdf_engine, filters, sections):
+    # Charts are drawn in the worker itself, the reports are what runs in parallel
+    return render_report(metrics, report_folder, charts_folder, chart_workers=1, pdf_engine=pdf_engine,
+                         filters=filters, sections=sections)
+
+
+def generate_batch_reports(partition_by='organizer', data_path=DEFAULT_DATA_PATH, output_folder=None,
+                           charts_folder=None, max_workers=None, pdf_engine='native', sections=None):
+    # Returns {value: pdf_path}, each report written to output_folder/<value>/ (default: see
+    # default_output_folder).
+    # charts_folder optionally keeps the chart PNGs, in charts_folder/<value>/.
+    # sections (see report_spec.parse_sections) restricts every report to some sections.
+    output_folder = output_folder or default_output_folder(partition_by)
+    event_cube = load_cached_cube(data_path)
+    partitions = partition_filters(event_cube, partition_by)
+    dimension = next(iter(partitions[0][1])) if partitions else partition_by
+    needed = required_metrics(sections) if sections else None
+
+    tasks = {}
+    with span('slice_cube', rows=len(partitions)):
+        for value, filters in partitions:
+            name = _folder_name(dimension, value)
+            tasks[value] = (filtered_metrics(event_cube, filters, needed), os.path.join(output_folder, name),
+                            os.path.join(charts_folder, name) if charts_folder else None, pdf_engine, filters,
+                            sections)
+
+    with span('batch_render', rows=len(tasks)):
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {value: executor.submit(_render_partition, *task) for value, task in tasks.items()}
+            # result() re-raises any error from the worker that wrote the report
+            return {value: future.result() for value, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write one event report per value of a column.')
+    parser.add_argument('--by', default='organizer',
+                        help='Column to split by: a cube dimension such as "Event Organizer", or organizer, '
+                             'event_type, event_name, ticket_type, gender, age_group')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--output', help='Folder of the reports (default: Report/by_<column>, e.g. Report/by_organizer)')
+    parser.add_argument('--workers', type=int, help='Reports written in parallel (default: one per CPU)')
+    parser.add_argument('--pdf-engine', default='native', choices=['native', 'word'])
+    parser.add_argument('--sections', help='Comma-separated report sections to include (default: all): '
+                                           'event_performance, demographics, insights')
+    args = parser.parse_args()
+
+    try:
+        sections = parse_sections(args.sections)
+    except ValueError as e:
+        parser.error(str(e))
+    reports = generate_batch_reports(args.by, args.data, args.output, max_workers=args.workers,
+                                     pdf_engine=args.pdf_engine, sections=sections)
+    for value, pdf_path in reports.items():
+        print(f'{value}: {pdf_path}')
+
+
+if __name__ == '__main__':
+    main()
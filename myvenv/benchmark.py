@@ -0,0 +1,256 @@
+import argparse
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import aggregations
+from aggregations import compute_metrics
+from ingestion import clean_events, stream_metrics
+from pdf_writer import write_pdf
+from report_document import build_docx
+from report_generator import build_chart_tasks, build_report_content
+from schema import read_event_csv
+
+# Synthetic event data generator and per-stage benchmark runner for the report pipeline.
+#
+#   python benchmark.py generate --rows 1M --events 50 --output BenchmarkData/events.csv
+#   python benchmark.py run --sizes 10k 1M 10M
+
+BENCHMARK_DATA_FOLDER = 'BenchmarkData'
+BENCHMARK_RESULTS_FOLDER = 'BenchmarkResults'
+DEFAULT_SIZES = ['10k', '1M', '10M']
+
+COLUMNS = [
+    'Event ID', 'Ticket ID', 'Ticket Type', 'Ticket Price', 'Ticket Availability', 'Ticket Sales Start Date',
+    'Ticket Sales End Date', 'Attendee Name', 'Attendee Contact Information', 'Attendee Age', 'Attendee Gender',
+    'Attendee Location', 'Check-in Status', 'Event Name', 'Event Type', 'Event Date', 'Event Time',
+    'Event Description', 'Event Organizer', 'Event Duration',
+]
+EVENT_TYPES = ['Seminar', 'Conference', 'Workshop', 'Concert', 'Sports']
+TICKET_TYPES = ['General', 'Pre Sold', 'VIP']
+TICKET_TYPE_WEIGHTS = [0.49, 0.355, 0.155]
+TICKET_PRICES = np.arange(2000, 10001, 500)
+EVENT_DURATIONS = [4, 5, 7, 8]
+GENDERS = ['Male', 'Female']
+CHECK_IN_STATUSES = ['Checked In', 'Not Checked In']
+FIRST_EVENT_DATE = np.datetime64('2024-08-01')
+EVENT_DATE_RANGE_DAYS = 61
+
+
+def parse_size(size):
+    # '10k' -> 10000, '1M' -> 1000000
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    size = str(size).strip().lower()
+    if size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+def _format_dates(days):
+    # Formats day offsets from FIRST_EVENT_DATE as m/d/Y without zero padding, like Data/event.csv
+    low, high = days.min(), days.max()
+    lookup = np.array([f'{d.month}/{d.day}/{d.year}'
+                       for d in pd.date_range(FIRST_EVENT_DATE + low, FIRST_EVENT_DATE + high)], dtype=object)
+    return lookup[days - low]
+
+
+def generate_event_csv(output_path, rows, events=8, organizers=None, locations=5000, seed=0,
+                       chunk_rows=500_000):
+    # Writes a CSV with the same columns and value formats as Data/event.csv
+    rng = np.random.default_rng(seed)
+    organizers = organizers or events
+
+    event_days = rng.integers(0, EVENT_DATE_RANGE_DAYS, events)
+    event_table = pd.DataFrame({
+        'Event ID': np.arange(1, events + 1),
+        'Event Name': [f'Event {i}' for i in range(1, events + 1)],
+        'Event Type': rng.choice(EVENT_TYPES, events),
+        'Event Day': event_days,
+        'Event Date': _format_dates(event_days),
+        'Event Time': [f'{rng.integers(0, 24)}:{rng.integers(0, 60):02d}:{rng.integers(0, 60):02d}'
+                       for _ in range(events)],
+        'Event Description': [f'Description of event {i}.' for i in range(1, events + 1)],
+        'Event Organizer': [f'Organizer {i}' for i in rng.integers(1, organizers + 1, events)],
+        'Event Duration': rng.choice(EVENT_DURATIONS, events),
+    })
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        event_rows = event_table.iloc[rng.integers(0, events, n)].reset_index(drop=True)
+        attendees = rng.integers(1, max(rows, 2), n)
+        sales_start = event_rows['Event Day'].to_numpy() - rng.integers(5, 60, n)
+        sales_end = sales_start + rng.integers(1, 50, n)
+        chunk = pd.DataFrame({
+            'Event ID': event_rows['Event ID'],
+            'Ticket ID': np.arange(written + 1, written + n + 1),
+            'Ticket Type': rng.choice(TICKET_TYPES, n, p=TICKET_TYPE_WEIGHTS),
+            'Ticket Price': rng.choice(TICKET_PRICES, n),
+            'Ticket Availability': rng.integers(0, 501, n),
+            'Ticket Sales Start Date': _format_dates(sales_start),
+            'Ticket Sales End Date': _format_dates(sales_end),
+            'Attendee Name': [f'Attendee {i}' for i in attendees],
+            'Attendee Contact Information': [f'attendee{i}@example.com' for i in attendees],
+            'Attendee Age': rng.integers(18, 71, n),
+            'Attendee Gender': rng.choice(GENDERS, n),
+            'Attendee Location': [f'Location {i}' for i in rng.integers(1, locations + 1, n)],
+            'Check-in Status': rng.choice(CHECK_IN_STATUSES, n),
+        })
+        for column in ['Event Name', 'Event Type', 'Event Date', 'Event Time', 'Event Description',
+                       'Event Organizer', 'Event Duration']:
+            chunk[column] = event_rows[column]
+        chunk[COLUMNS].to_csv(output_path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += n
+    return output_path
+
+
+def _measure(results, stage, function, *args, rows=None, track_memory=False):
+    # Runs one stage and appends its duration (or peak Python memory) to results
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = function(*args)
+    seconds = time.perf_counter() - start
+    result = {'stage': stage, 'rows': rows}
+    if track_memory:
+        result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        tracemalloc.stop()
+    else:
+        result['seconds'] = round(seconds, 4)
+    results.append(result)
+    return value
+
+
+def _run_stages(data_path, work_folder, chunksize=None, track_memory=False):
+    stages = []
+    if chunksize:
+        metrics = _measure(stages, 'stream_aggregate', stream_metrics, data_path, chunksize,
+                           track_memory=track_memory)
+    else:
+        df = _measure(stages, 'load', read_event_csv, data_path, track_memory=track_memory)
+        rows = len(df)
+        stages[-1]['rows'] = rows
+        df = _measure(stages, 'clean', clean_events, df, rows=rows, track_memory=track_memory)
+        metrics = _measure(stages, 'aggregate', compute_metrics, df, rows=len(df), track_memory=track_memory)
+        del df
+
+    os.makedirs(work_folder, exist_ok=True)
+    charts = {}
+    for name, plot_function, args in build_chart_tasks(metrics):
+        output = io.BytesIO()
+        _measure(stages, f'chart:{name}', plot_function, *args, output, track_memory=track_memory)
+        charts[name] = output.getvalue()
+
+    doc = build_report_content(metrics, charts)
+    _measure(stages, 'docx', build_docx, doc, os.path.join(work_folder, 'report.docx'), track_memory=track_memory)
+    _measure(stages, 'pdf', write_pdf, doc, os.path.join(work_folder, 'report.pdf'), track_memory=track_memory)
+    return stages, metrics
+
+
+def run_benchmark(data_path, work_folder, chunksize=None, track_memory=True):
+    # Times every stage of generate_report on data_path, one chart at a time. tracemalloc
+    # slows allocation-heavy stages down several times, so peak memory is measured in a
+    # second pass and the timings come from an untraced one.
+    stages, metrics = _run_stages(data_path, work_folder, chunksize)
+    if track_memory:
+        for stage, traced in zip(stages, _run_stages(data_path, work_folder, chunksize, track_memory=True)[0]):
+            stage['peak_mb'] = traced['peak_mb']
+
+    for stage in stages:
+        peak = f" {stage['peak_mb']:10.1f} MB" if 'peak_mb' in stage else ''
+        print(f"  {stage['stage']:<45} {stage['seconds']:9.3f}s{peak}")
+
+    # In validate mode, the worst relative error of the approximate distinct counts
+    distinct_errors = {name: round(float(comparison['relative_error'].abs().max()), 5)
+                       for name, comparison in metrics.get('distinct_validation', {}).items()}
+    for name, error in distinct_errors.items():
+        print(f"  {'max error ' + name:<45} {error:9.2%}")
+    return stages, distinct_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the event report pipeline on synthetic data.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='Write a synthetic event CSV')
+    generate_parser.add_argument('--rows', default='10k')
+    generate_parser.add_argument('--output')
+    generate_parser.add_argument('--events', type=int, default=8)
+    generate_parser.add_argument('--organizers', type=int)
+    generate_parser.add_argument('--locations', type=int, default=5000)
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    run_parser = subparsers.add_parser('run', help='Time and memory-profile each report stage')
+    run_parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES)
+    run_parser.add_argument('--events', type=int, default=8)
+    run_parser.add_argument('--organizers', type=int)
+    run_parser.add_argument('--locations', type=int, default=5000)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--chunksize', type=int, help='Benchmark the chunked streaming path')
+    run_parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    run_parser.add_argument('--label', default='', help='Added to the results file name')
+    run_parser.add_argument('--distinct', choices=['exact', 'approximate', 'validate'],
+                            default=aggregations.DISTINCT_MODE,
+                            help='Distinct count mode (see REPORT_DISTINCT_MODE in aggregations.py)')
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        rows = parse_size(args.rows)
+        output = args.output or os.path.join(BENCHMARK_DATA_FOLDER, f'events_{rows}.csv')
+        generate_event_csv(output, rows, args.events, args.organizers, args.locations, args.seed)
+        print(f'Wrote {rows} rows to {output}')
+        return
+
+    aggregations.DISTINCT_MODE = args.distinct
+    for size in args.sizes:
+        rows = parse_size(size)
+        cardinality = f'{args.events}e_{args.organizers or args.events}o_{args.locations}l_s{args.seed}'
+        data_path = os.path.join(BENCHMARK_DATA_FOLDER, f'events_{rows}_{cardinality}.csv')
+        # Generated inputs are kept, so reruns compare against identical data
+        if not os.path.exists(data_path):
+            print(f'Generating {rows} rows...')
+            generate_event_csv(data_path, rows, args.events, args.organizers, args.locations, args.seed)
+
+        print(f'Benchmarking {data_path}')
+        started_at = datetime.now()
+        stages, distinct_errors = run_benchmark(data_path, os.path.join(BENCHMARK_RESULTS_FOLDER, 'work'),
+                                                args.chunksize, track_memory=not args.no_memory)
+        result = {
+            'started_at': started_at.isoformat(),
+            'rows': rows,
+            'data_path': data_path,
+            'events': args.events,
+            'organizers': args.organizers or args.events,
+            'locations': args.locations,
+            'chunksize': args.chunksize,
+            'distinct_mode': args.distinct,
+            'distinct_error': aggregations.DISTINCT_ERROR if args.distinct != 'exact' else None,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_seconds': round(sum(stage['seconds'] for stage in stages), 4),
+            'stages': stages,
+        }
+        if distinct_errors:
+            result['distinct_max_relative_error'] = distinct_errors
+        label = f'_{args.label}' if args.label else ''
+        results_path = os.path.join(BENCHMARK_RESULTS_FOLDER,
+                                    f'{started_at:%Y%m%d_%H%M%S}_{rows}{label}.json')
+        os.makedirs(BENCHMARK_RESULTS_FOLDER, exist_ok=True)
+        with open(results_path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'Results written to {results_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import numpy as np
+
+# Chart summaries of weighted distributions (value -> count), computed from the counts
+# alone so their cost depends on the number of distinct values, never on the number of rows.
+#
+# binned_distribution gives the histogram and Gaussian density curve of the ticket price
+# chart: the histogram sums counts per bin, the density linear-bins the counts onto a
+# regular grid and convolves it with the kernel through an FFT. box_summaries gives the
+# five-number summaries of the age boxplot.
+
+# Grid the counts are binned onto; finer than the curve so linear binning error is small
+BINNING_GRID_SIZE = 1024
+
+
+def _bandwidth(values, weights):
+    # Scott's rule with one observation per counted row, as a KDE of the raw rows would use
+    total = weights.sum()
+    mean = (values * weights).sum() / total
+    variance = (weights * (values - mean) ** 2).sum() / max(total - 1, 1)
+    return np.sqrt(variance) * total ** -0.2
+
+
+def _linear_binning(values, weights, grid_start, step, size):
+    # Each count is split between its two nearest grid points, in proportion to distance
+    position = (values - grid_start) / step
+    lower = np.clip(np.floor(position).astype(int), 0, size - 2)
+    fraction = position - lower
+    binned = np.zeros(size)
+    np.add.at(binned, lower, weights * (1 - fraction))
+    np.add.at(binned, lower + 1, weights * fraction)
+    return binned
+
+
+def binned_distribution(value_counts, bins=20, gridsize=200):
+    # {'edges', 'counts', 'grid', 'density'}: histogram bin edges and counts, and the density
+    # curve on gridsize points between the smallest and largest value, scaled to counts per
+    # bin so it can be drawn over the bars
+    values = value_counts.index.to_numpy(dtype=float)
+    weights = value_counts.to_numpy(dtype=float)
+    keep = ~np.isnan(values) & (weights > 0)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return {'edges': np.array([0.0, 1.0]), 'counts': np.zeros(1), 'grid': np.empty(0), 'density': np.empty(0)}
+
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    grid = np.linspace(values.min(), values.max(), gridsize)
+    bandwidth = _bandwidth(values, weights)
+    if not bandwidth > 0:
+        return {'edges': edges, 'counts': counts, 'grid': np.empty(0), 'density': np.empty(0)}
+
+    # The binning grid extends four bandwidths past the data so the kernel tails fit
+    grid_start = values.min() - 4 * bandwidth
+    grid_end = values.max() + 4 * bandwidth
+    step = (grid_end - grid_start) / (BINNING_GRID_SIZE - 1)
+    binned = _linear_binning(values, weights, grid_start, step, BINNING_GRID_SIZE)
+
+    # Kernel sampled at the grid offsets, zero-padded so the circular convolution is linear
+    offsets = np.arange(-BINNING_GRID_SIZE + 1, BINNING_GRID_SIZE) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    size = 2 ** int(np.ceil(np.log2(len(binned) + len(kernel) - 1)))
+    smoothed = np.fft.irfft(np.fft.rfft(binned, size) * np.fft.rfft(kernel, size), size)
+    smoothed = smoothed[BINNING_GRID_SIZE - 1:2 * BINNING_GRID_SIZE - 1] / weights.sum()
+
+    binning_grid = grid_start + np.arange(BINNING_GRID_SIZE) * step
+    density = np.interp(grid, binning_grid, np.clip(smoothed, 0, None))
+    # Probability density to expected rows per histogram bin
+    density *= weights.sum() * (edges[1] - edges[0])
+    return {'edges': edges, 'counts': counts, 'grid': grid, 'density': density}
+
+
+# Outliers drawn per box at most; beyond that an evenly spaced sample of them is drawn
+MAX_FLIERS = 100
+
+
+def _percentiles(values, cumulative, qs):
+    # Linear interpolation between the two closest rows, as np.percentile on the rows
+    positions = (cumulative[-1] - 1) * np.asarray(qs)
+    lower = values[np.searchsorted(cumulative, np.floor(positions), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(positions), side='right')]
+    return lower + (upper - lower) * (positions - np.floor(positions))
+
+
+def box_summaries(counts, whis=1.5):
+    # {group: stats} from counts indexed by (group, value), each stats dict in the form
+    # matplotlib's Axes.bxp draws (the same as matplotlib.cbook.boxplot_stats on the rows)
+    summaries = {}
+    for group, group_counts in counts[counts > 0].groupby(level=0, observed=True):
+        group_counts = group_counts.droplevel(0).sort_index()
+        values = group_counts.index.to_numpy(dtype=float)
+        cumulative = np.cumsum(group_counts.to_numpy())
+        q1, med, q3 = _percentiles(values, cumulative, [0.25, 0.5, 0.75])
+        low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        inside = values[(values >= low) & (values <= high)]
+        fliers = values[(values < low) | (values > high)]
+        if len(fliers) > MAX_FLIERS:
+            fliers = fliers[np.linspace(0, len(fliers) - 1, MAX_FLIERS).astype(int)]
+        summaries[group] = {
+            'label': group,
+            'q1': q1,
+            'med': med,
+            'q3': q3,
+            'whislo': min(inside.min(), q1) if len(inside) else q1,
+            'whishi': max(inside.max(), q3) if len(inside) else q3,
+            'fliers': fliers,
+        }
+    return summaries
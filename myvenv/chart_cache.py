@@ -0,0 +1,91 @@
+import hashlib
+import inspect
+import os
+import pickle
+
+import matplotlib
+import pandas as pd
+import seaborn as sns
+
+from storage import atomic_write
+
+CHART_CACHE_FOLDER = os.environ.get('CHART_CACHE_FOLDER', 'ChartCache')
+# Least recently used PNGs are evicted once the cache grows past this size
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+
+def _update_with_data(digest, value):
+    # Series and DataFrames are hashed by their values, index, names and dtypes so that
+    # equal aggregates give equal keys regardless of how they were computed
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        digest.update(type(value).__name__.encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        digest.update(repr(value.index.names).encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+            digest.update(repr(list(value.dtypes)).encode())
+        else:
+            digest.update(repr((value.name, value.dtype)).encode())
+    else:
+        digest.update(pickle.dumps(value))
+
+
+def chart_cache_key(name, plot_function, args):
+    # The plot function's source holds every style parameter of the chart (figure size,
+    # colours, titles, rotations), so editing the chart's look invalidates its entries
+    digest = hashlib.sha256()
+    digest.update(name.encode())
+    digest.update(inspect.getsource(plot_function).encode())
+    digest.update(f'{matplotlib.__version__}/{sns.__version__}'.encode())
+    for value in args:
+        _update_with_data(digest, value)
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CHART_CACHE_FOLDER, f'{key}.png')
+
+
+def fetch_cached_chart(key):
+    # Returns the cached PNG bytes, or None on a cache miss
+    cached_path = _cache_path(key)
+    try:
+        with open(cached_path, 'rb') as f:
+            image = f.read()
+        # Refresh the modification time so eviction treats it as recently used
+        os.utime(cached_path)
+    except FileNotFoundError:
+        return None
+    return image
+
+
+def store_cached_chart(key, image):
+    os.makedirs(CHART_CACHE_FOLDER, exist_ok=True)
+    # Write to a temporary name first so other processes never read a half-written PNG
+    with atomic_write(_cache_path(key)) as tmp_path, open(tmp_path, 'wb') as f:
+        f.write(image)
+
+
+def evict_chart_cache(max_bytes=CHART_CACHE_MAX_BYTES):
+    if not os.path.isdir(CHART_CACHE_FOLDER):
+        return
+    entries = []
+    for entry in os.scandir(CHART_CACHE_FOLDER):
+        # Hidden files are PNGs still being written
+        if not entry.name.endswith('.png') or entry.name.startswith('.'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
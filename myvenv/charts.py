@@ -0,0 +1,251 @@
+import colorsys
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+# Charts are only ever rendered to PNG, so worker processes never need a GUI backend
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from chart_cache import chart_cache_key, fetch_cached_chart, store_cached_chart, evict_chart_cache
+from instrumentation import span, collect_spans, add_spans
+
+
+# 1. Total Ticket Sales by Event
+def plot_total_ticket_sales_by_event(event_sales, output):
+    plt.figure(figsize=(10, 6))
+    event_sales.plot(kind='bar', color=['orange', 'lightblue', 'lightgreen', 'purple', 'pink'])
+    plt.title('Total Ticket Sales by Event')
+    plt.ylabel('Number of Tickets Sold')
+    plt.xlabel('Event Name')
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 2. Tickets Sold by Event Type
+def plot_tickets_sold_by_event_type(event_type_sales, output):
+    plt.figure(figsize=(10, 6))
+    event_type_sales.plot(kind='bar', color=['orange', 'lightblue', 'lightgreen', 'purple', 'pink'])
+    plt.title('Tickets Sold by Event Type')
+    plt.xlabel('Event Type')
+    plt.ylabel('Number of Tickets Sold')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 3. Event Type Popularity
+def plot_event_type_popularity(event_type_popularity, output):
+    plt.figure(figsize=(10, 6))
+    event_type_popularity.plot(kind='pie', autopct='%1.1f%%', startangle=90,
+                               colors=sns.color_palette('coolwarm', len(event_type_popularity)))
+    plt.title('Event Type Popularity')
+    plt.ylabel('')
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 4. Tickets Sold by Event Organizer
+def plot_tickets_sold_by_organizer(tickets_by_organizer, output):
+    plt.figure(figsize=(12, 7))
+    tickets_by_organizer.plot(kind='bar', color=['orange', 'lightblue', 'lightgreen', 'purple', 'pink'])
+    plt.title('Total Tickets Sold by Event Organizer')
+    plt.xlabel('Event Organizer')
+    plt.ylabel('Total Number of Tickets Sold')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 5. Ticket Sales Distribution by Price
+def plot_ticket_sales_distribution_by_price(price_histogram, output):
+    plt.figure(figsize=(10, 6))
+    # Bars and density curve come pre-computed from the price counts (see binned_kde.py),
+    # so drawing costs the same however many tickets there are
+    edges = price_histogram['edges']
+    # alpha=.5 is what histplot uses for the bars when it draws the KDE itself
+    sns.histplot(x=(edges[:-1] + edges[1:]) / 2, weights=price_histogram['counts'], bins=edges.tolist(),
+                 color='purple', alpha=.5)
+    plt.plot(price_histogram['grid'], price_histogram['density'], color='purple')
+    plt.title('Ticket Sales Distribution by Price')
+    plt.xlabel('Ticket Price')
+    plt.ylabel('No Of Tickets')
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 6. Average Ticket Price per Event
+def plot_avg_ticket_price_per_event(avg_ticket_price_per_event, output):
+    plt.figure(figsize=(10, 6))
+    avg_ticket_price_per_event.plot(kind='bar', color=['lightblue', 'lightgreen'])
+    plt.title('Average Ticket Price per Event')
+    plt.xlabel('Event Name')
+    plt.ylabel('Average Ticket Price')
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 7. Ticket Type Distribution by Event Type
+def plot_ticket_type_distribution(ticket_types_by_event_type, ticket_type_count, output):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    # Ticket Type Distribution by Event Type (Bar Chart on the Left)
+    ticket_types = ticket_types_by_event_type.rename('Ticket Count').reset_index()
+    # One precomputed count per bar, so there is no confidence interval to bootstrap
+    sns.barplot(data=ticket_types, x='Event Type', y='Ticket Count', hue='Ticket Type', palette='coolwarm',
+                errorbar=None, ax=axes[0])
+    axes[0].set_title('Ticket Type Distribution by Event Type')
+    axes[0].set_xlabel('Event Type')
+    axes[0].set_ylabel('Ticket Count')
+    axes[0].tick_params(axis='x', rotation=45)
+    axes[0].legend(title='Ticket Type')
+    #  Ticket Type Popularity (Pie Chart on the Right)
+    ticket_type_count.plot(kind='pie', autopct='%1.1f%%', startangle=90,
+                           colors=sns.color_palette('Paired', len(ticket_type_count)), ax=axes[1])
+    axes[1].set_title('Ticket Type Popularity')
+    axes[1].set_ylabel('')  # Remove the y-label for the pie chart
+    axes[1].axis('equal')  # Ensures the pie chart is a circle
+    # Adjust layout to avoid overlap
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 8. Average Event Duration by Event Type
+def plot_avg_event_duration(avg_event_duration, output):
+    plt.figure(figsize=(10, 6))
+    avg_event_duration.plot(kind='bar', color='darkcyan')
+    plt.title('Average Event Duration by Event Type')
+    plt.xlabel('Event Type')
+    plt.ylabel('Average Duration (Hours)')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 9. Attendee Age Distribution by Event Type
+def plot_attendee_age_distribution(age_summaries, output):
+    plt.figure(figsize=(10, 6))
+    ax = plt.gca()
+    # Boxes are drawn from the precomputed five-number summaries (see binned_kde.box_summaries)
+    # with the styling sns.boxplot(x='Event Type', palette='coolwarm') gives them
+    stats = list(age_summaries.values())
+    colors = sns.color_palette('coolwarm', len(stats), desat=.75)
+    lum = min(colorsys.rgb_to_hls(*color)[1] for color in colors) * .6
+    line_color = (lum, lum, lum)
+    artists = ax.bxp(stats, positions=range(len(stats)), widths=.8, capwidths=.4, patch_artist=True,
+                     manage_ticks=False, boxprops={'edgecolor': line_color},
+                     medianprops={'color': line_color, 'solid_capstyle': 'butt'},
+                     whiskerprops={'color': line_color, 'solid_capstyle': 'butt'},
+                     flierprops={'markeredgecolor': line_color}, capprops={'color': line_color})
+    for box, color in zip(artists['boxes'], colors):
+        box.set_facecolor(color)
+    ax.set_xticks(range(len(stats)), [summary['label'] for summary in stats])
+    ax.set_xlim(-.5, len(stats) - .5)
+    ax.xaxis.grid(False)
+    plt.title('Attendee Age Distribution by Event Type')
+    plt.xlabel('Event Type')
+    plt.ylabel('Attendee Age')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+# 10. Gender Distribution
+def plot_gender_distribution(gender_count, gender_event_distribution, output):
+    fig, axes = plt.subplots(1, 2, figsize=(16, 8))
+    # Pie Chart: Overall Attendee Gender Distribution (on the right)
+    # Assign blue for Male and pink for Female
+    gender_count.plot(kind='pie', autopct='%1.1f%%', startangle=90,
+                      colors=['lightblue', 'pink'], ax=axes[1])
+    axes[1].set_title('Overall Attendee Gender Distribution')
+    axes[1].set_ylabel('')  # Remove the y-label for the pie chart
+    axes[1].axis('equal')  # Ensures the pie chart is a circle
+    # Stacked Bar Chart: Gender Distribution by Event (on the left)
+    # Plot the stacked bar chart with blue for Male and pink for Female
+    gender_event_distribution.plot(kind='bar', stacked=True, color=['lightblue', 'pink'], ax=axes[0])
+    axes[0].set_title('Attendee Gender Distribution by Event')
+    axes[0].set_xlabel('Event Name')
+    axes[0].set_ylabel('Number of Attendees')
+    axes[0].tick_params(axis='x', rotation=45, labelsize=10)  # Rotate x-ticks for readability
+    axes[0].legend(title='Gender', labels=['Male', 'Female'], loc='upper right')
+    # Adjust layout to avoid overlap
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+def warm_up():
+    # Draws and discards a small figure, so the first real chart in this process doesn't pay
+    # for loading fonts, seaborn's styles and the PNG writer
+    plt.figure(figsize=(1, 1))
+    sns.barplot(x=['a'], y=[1])
+    plt.title('warm up')
+    plt.savefig(io.BytesIO())
+    plt.close()
+
+
+def _render_chart(name, plot_function, args):
+    # Returns the PNG bytes and the chart's span, so both can be sent back to the parent process
+    output = io.BytesIO()
+    with collect_spans() as spans:
+        with span(f'chart:{name}'):
+            plot_function(*args, output)
+    return output.getvalue(), spans
+
+
+def render_charts(chart_tasks, charts_folder=None, max_workers=None, use_cache=True):
+    # chart_tasks is a list of (chart name, plot function, data args) tuples.
+    # Each task only carries the data its chart needs, so workers receive small
+    # aggregates instead of the whole cleaned frame. Returns {chart name: png bytes};
+    # charts are rendered in memory and only written to charts_folder when one is given.
+    images = {}
+
+    # Charts whose inputs and style match an earlier run are read from the cache
+    cache_keys = {}
+    if use_cache:
+        with span('chart_cache_lookup', rows=len(chart_tasks)):
+            for name, plot_function, args in chart_tasks:
+                cache_keys[name] = chart_cache_key(name, plot_function, args)
+                cached = fetch_cached_chart(cache_keys[name])
+                if cached is not None:
+                    images[name] = cached
+    missing_tasks = [task for task in chart_tasks if task[0] not in images]
+
+    if max_workers == 1 or len(missing_tasks) <= 1:
+        for name, plot_function, args in missing_tasks:
+            images[name], spans = _render_chart(name, plot_function, args)
+            add_spans(spans)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: executor.submit(_render_chart, name, plot_function, args)
+                       for name, plot_function, args in missing_tasks}
+            # result() re-raises any error from the worker that drew the chart
+            for name, future in futures.items():
+                images[name], spans = future.result()
+                add_spans(spans)
+
+    if use_cache and missing_tasks:
+        for name, _, _ in missing_tasks:
+            store_cached_chart(cache_keys[name], images[name])
+        evict_chart_cache()
+
+    if charts_folder is not None:
+        # On-disk copies, for looking at the charts outside the report
+        os.makedirs(charts_folder, exist_ok=True)
+        for name, image in images.items():
+            with open(os.path.join(charts_folder, f'{name}.png'), 'wb') as f:
+                f.write(image)
+    # Same order as chart_tasks
+    return {name: images[name] for name, _, _ in chart_tasks}
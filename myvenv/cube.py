@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from aggregations import GROUP_METRICS, DISTINCT_METRICS, VALUE_COUNTS, finalize_metrics, plan_partial
+from report_filters import REPORT_FILTERS
+
+# Pre-aggregated cube of the cleaned events. Every row is rolled up into a cell per
+# combination of the dimensions below, holding the additive measures of GROUP_METRICS,
+# the min/max ticket price and the distinct attendee names and ticket IDs. Columns the
+# report counts by value but that are not dimensions (location, price, age) are kept as
+# row counts per cell and value. Slicing the cube gives the same partial aggregates as
+# aggregations.partial_metrics on the matching rows, so a filtered report never reads
+# the raw rows again.
+
+CUBE_DIMENSIONS = [
+    'Event Name',
+    'Event Type',
+    'Event Organizer',
+    'Ticket Type',
+    'Attendee Gender',
+    'Age Group',
+    'Event Month',
+    # Each event is held on one date, so this adds no cells; it allows date range filters
+    'Event Date',
+]
+
+CUBE_MEASURES = {name: spec for group_metrics in GROUP_METRICS.values() for name, spec in group_metrics.items()}
+CUBE_MEASURES['min_price'] = ('Ticket Price', 'min')
+CUBE_MEASURES['max_price'] = ('Ticket Price', 'max')
+
+# Columns whose distinct values are kept per cell, as sets
+CUBE_DISTINCT_COLUMNS = sorted({column for _, column in DISTINCT_METRICS.values() if column not in CUBE_DIMENSIONS})
+
+# Columns whose values are counted per cell
+CUBE_VALUE_COLUMNS = sorted({column for columns in VALUE_COUNTS.values()
+                             for column in ([columns] if isinstance(columns, str) else columns)
+                             if column not in CUBE_DIMENSIONS})
+
+def build_cube(df):
+    # NaN keys are kept as cells of their own, so slices drop them exactly where
+    # partial_metrics would
+    grouped = df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False)
+    cells = grouped.agg(**CUBE_MEASURES)
+    for column in CUBE_DISTINCT_COLUMNS:
+        cells[column] = grouped[column].unique().map(set)
+    values = {column: df.groupby(CUBE_DIMENSIONS + [column], observed=True, dropna=False).size()
+              for column in CUBE_VALUE_COLUMNS}
+    return {'cells': cells, 'values': values}
+
+
+def _mask(index, filters):
+    mask = np.ones(len(index), dtype=bool)
+    for dimension, values in filters.items():
+        level = index.get_level_values(dimension)
+        if dimension == 'Event Date':
+            start, end = values
+            dates = pd.DatetimeIndex(level)
+            if start is not None:
+                mask &= dates >= pd.Timestamp(start)
+            if end is not None:
+                mask &= dates <= pd.Timestamp(end)
+        else:
+            mask &= level.isin(values)
+    return mask
+
+
+def _union(sets):
+    return set().union(*sets)
+
+
+def slice_cube(cube, filters, metrics=None):
+    # Partial aggregates (as returned by aggregations.partial_metrics) of the rows matching
+    # filters, for the named metrics. Raises ValueError when no rows match.
+    cells = cube['cells'][_mask(cube['cells'].index, filters)]
+    if cells.empty:
+        raise ValueError('No events match the report filters')
+    plan = plan_partial(metrics)
+    keys = cells.index.to_frame(index=False)
+
+    partial = {'groups': {}, 'distinct': {}, 'counts': {}}
+    for key, group_metrics in GROUP_METRICS.items():
+        if key in plan['groups']:
+            partial['groups'][key] = cells.groupby(level=key, observed=True)[list(group_metrics)].sum()
+    for name, (key, column) in DISTINCT_METRICS.items():
+        if name not in plan['distinct']:
+            continue
+        if column in CUBE_DIMENSIONS:
+            partial['distinct'][name] = keys.groupby(key, observed=True)[column].unique().map(set)
+        else:
+            partial['distinct'][name] = cells[column].groupby(level=key, observed=True).agg(_union)
+    for name, columns in VALUE_COUNTS.items():
+        if name not in plan['counts']:
+            continue
+        value_columns = [column for column in ([columns] if isinstance(columns, str) else columns)
+                         if column not in CUBE_DIMENSIONS]
+        if value_columns:
+            counts = cube['values'][value_columns[0]]
+            counts = counts[_mask(counts.index, filters)]
+        else:
+            counts = cells['rows'].rename(None)
+        partial['counts'][name] = counts.groupby(level=columns, observed=True).sum()
+    if plan['totals']:
+        partial['totals'] = {
+            'revenue': cells['revenue'].sum(),
+            'min_price': cells['min_price'].min(),
+            'max_price': cells['max_price'].max(),
+        }
+    return partial
+
+
+def filtered_metrics(cube, filters, metrics=None):
+    return finalize_metrics(slice_cube(cube, filters, metrics), metrics)
+
+
+def partition_filters(cube, dimension):
+    # One filter per value of dimension present in the cube, for reports split by that
+    # dimension. dimension is a CUBE_DIMENSIONS entry or a REPORT_FILTERS name.
+    dimension = REPORT_FILTERS.get(dimension, dimension)
+    if dimension not in CUBE_DIMENSIONS:
+        raise ValueError(f'Cannot partition reports by {dimension}; choose one of {", ".join(CUBE_DIMENSIONS)}')
+    values = cube['cells'].index.get_level_values(dimension).dropna().unique().sort_values()
+    if dimension == 'Event Date':
+        return [(value, {dimension: (value.date(), value.date())}) for value in values]
+    return [(value, {dimension: [value]}) for value in values]
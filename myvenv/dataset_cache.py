@@ -0,0 +1,107 @@
+import glob
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+import cube
+import ingestion
+from instrumentation import span
+from schema import partition_paths
+from storage import (AGGREGATION_SETTINGS, AGGREGATION_SOURCES, CLEANING_SETTINGS, CLEANING_SOURCES, atomic_write,
+                     code_version)
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, the cache falls back to pickle files
+    feather = None
+
+DATASET_CACHE_FOLDER = os.environ.get('DATASET_CACHE_FOLDER', 'Cache')
+CACHE_EXTENSION = '.feather' if feather is not None else '.pkl'
+
+
+def _source_prefix(data_path):
+    # Identifies the source file, so stale entries for it can be found and removed
+    return hashlib.sha256(os.path.abspath(data_path).encode()).hexdigest()[:16]
+
+
+def _fingerprint(data_path, version):
+    # Changes whenever the source file (or a partition file, see schema.partition_paths) is
+    # modified, added or removed, or the code version (see storage.code_version) changes
+    digest = hashlib.sha256(version.encode())
+    for path in partition_paths(data_path):
+        stat = os.stat(path)
+        digest.update(f'{path}/{stat.st_size}/{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _remove_stale(pattern, keep_path):
+    # Drop entries made from earlier versions of the same file
+    for stale_path in glob.glob(pattern):
+        if stale_path != keep_path:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+
+
+def _read_cached(path):
+    if feather is not None:
+        # Uncompressed Feather files are memory-mapped, so columns load without copying the file
+        return feather.read_feather(path, memory_map=True)
+    return pd.read_pickle(path)
+
+
+def _write_cached(df, path):
+    # Publish atomically so concurrent readers never see a half-written file
+    with atomic_write(path) as tmp_path:
+        if feather is not None:
+            # Feather needs a default index
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+        else:
+            df.to_pickle(tmp_path)
+
+
+def load_cached_events(data_path=ingestion.DEFAULT_DATA_PATH):
+    # Returns the cleaned frame for data_path, reusing the cached copy while the CSV is unchanged
+    prefix = _source_prefix(data_path)
+    fingerprint = _fingerprint(data_path, code_version(CLEANING_SOURCES, CLEANING_SETTINGS))
+    cache_path = os.path.join(DATASET_CACHE_FOLDER, f'cleaned_{prefix}_{fingerprint}{CACHE_EXTENSION}')
+    if os.path.exists(cache_path):
+        try:
+            with span('load_cached') as record:
+                df = _read_cached(cache_path)
+                record['rows'] = len(df)
+            return df
+        except FileNotFoundError:
+            pass
+
+    df = ingestion.load_events(data_path)
+    os.makedirs(DATASET_CACHE_FOLDER, exist_ok=True)
+    _write_cached(df, cache_path)
+    _remove_stale(os.path.join(DATASET_CACHE_FOLDER, f'cleaned_{prefix}_*'), cache_path)
+    return df
+
+
+def load_cached_cube(data_path=ingestion.DEFAULT_DATA_PATH):
+    # Returns the report cube (see cube.py) for data_path, built from the cleaned frame the
+    # first time and reused while the CSV is unchanged
+    prefix = _source_prefix(data_path)
+    fingerprint = _fingerprint(data_path, code_version(AGGREGATION_SOURCES + ['cube.py'], AGGREGATION_SETTINGS))
+    cache_path = os.path.join(DATASET_CACHE_FOLDER, f'cube_{prefix}_{fingerprint}.pkl')
+    if os.path.exists(cache_path):
+        try:
+            with span('load_cube'):
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+        except FileNotFoundError:
+            pass
+
+    df = load_cached_events(data_path)
+    with span('build_cube', rows=len(df)):
+        event_cube = cube.build_cube(df)
+    with atomic_write(cache_path) as tmp_path, open(tmp_path, 'wb') as f:
+        pickle.dump(event_cube, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _remove_stale(os.path.join(DATASET_CACHE_FOLDER, f'cube_{prefix}_*'), cache_path)
+    return event_cube
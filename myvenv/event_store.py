@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from aggregations import DISTINCT_METRICS, GROUP_METRICS, VALUE_COUNTS, finalize_metrics, plan_partial
+from ingestion import DEFAULT_DATA_PATH, load_events
+from instrumentation import span
+from schema import data_version
+from storage import atomic_write
+
+# Local SQLite store of the cleaned events. The ingest command cleans the CSV (or the
+# partition files, see schema.partition_paths) once and writes the rows to an indexed
+# table; reports generated from the store push their filters and group-bys down to SQL, so
+# each report only reads the aggregates it needs from the matching rows, like a slice of
+# the cube (see cube.py) but without building one first.
+#
+#   python event_store.py --data Data/event.csv --store Data/events.sqlite
+#
+# REPORT_DATA_PATH=Data/events.sqlite then generates the reports from the store. The store
+# is a snapshot: run the ingest command again after the CSV changes.
+
+EVENT_STORE_PATH = os.environ.get('REPORT_EVENT_STORE', os.path.join('Data', 'events.sqlite'))
+# Files with these extensions are read as an event store rather than as CSV
+EVENT_STORE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+# Columns the report filters and groups by most
+INDEXED_COLUMNS = ['Event Date', 'Event Type', 'Event Organizer', 'Ticket ID']
+# Gender is kept as its 0/1 code, which would otherwise be stored as text
+COLUMN_TYPES = {'Attendee Gender': 'INTEGER'}
+# Rows written per INSERT batch
+INGEST_CHUNK_SIZE = 50_000
+
+# SQL for each GROUP_METRICS aggregation. TOTAL is 0.0 for a group without values, as sum is.
+SQL_AGGREGATES = {
+    'size': 'COUNT(*)',
+    'count': 'COUNT({})',
+    'sum': 'TOTAL({})',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+}
+
+# Columns with few distinct values that the report groups by. Each query scans every
+# matching row, so rather than one query per grouping, a single query groups the rows by
+# all of these columns at once (a few cells per event) and every aggregate over them is
+# rolled up from its result, as cube.py does. Only groupings by other columns (attendee
+# names, ticket IDs, locations, prices, ages) are queries of their own.
+CELL_COLUMNS = ['Event Name', 'Event Type', 'Event Organizer', 'Ticket Type', 'Attendee Gender', 'Event Month']
+CELL_MEASURES = {name: spec for group_metrics in GROUP_METRICS.values() for name, spec in group_metrics.items()}
+CELL_MEASURES['rows'] = ('Ticket ID', 'size')
+CELL_MEASURES['min_price'] = ('Ticket Price', 'min')
+CELL_MEASURES['max_price'] = ('Ticket Price', 'max')
+
+
+def is_event_store(data_path):
+    return data_path.lower().endswith(EVENT_STORE_EXTENSIONS)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _columns(columns):
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def ingest_events(data_path=DEFAULT_DATA_PATH, store_path=EVENT_STORE_PATH):
+    # Cleans data_path and replaces the store at store_path with its rows. Returns the
+    # number of rows stored.
+    df = load_events(data_path)
+    folder = os.path.dirname(store_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # Publish atomically so reports never read a half-written store
+    with atomic_write(store_path) as tmp_path:
+        with span('store_ingest', rows=len(df)), closing(sqlite3.connect(tmp_path)) as connection:
+            df.to_sql('events', connection, index=False, chunksize=INGEST_CHUNK_SIZE, dtype=COLUMN_TYPES)
+            for column in INDEXED_COLUMNS:
+                connection.execute(f'CREATE INDEX {_quote("idx_" + column.lower().replace(" ", "_"))} '
+                                   f'ON events ({_quote(column)})')
+            connection.execute('CREATE TABLE ingest_info '
+                               '(source TEXT, data_version TEXT, ingested_at TEXT, rows INTEGER)')
+            connection.execute('INSERT INTO ingest_info VALUES (?, ?, ?, ?)',
+                               (data_path, json.dumps(data_version(data_path)), datetime.now().isoformat(), len(df)))
+            # Statistics for the query planner's choice of index
+            connection.execute('ANALYZE')
+            connection.commit()
+    return len(df)
+
+
+def _connect(store_path):
+    # Read-only, so a wrong path fails instead of creating an empty store
+    if not os.path.exists(store_path):
+        raise FileNotFoundError(f'No event store at {store_path}; create it with python event_store.py')
+    return sqlite3.connect(f'file:{store_path}?mode=ro', uri=True)
+
+
+def _where(filters, not_null=()):
+    # WHERE clause and parameters for report filters (see report_filters.parse_report_filters),
+    # skipping rows with no value in any of not_null, as groupby does with missing keys
+    clauses = []
+    params = []
+    for column, values in filters.items():
+        if column == 'Event Date':
+            # Dates are stored as 'YYYY-MM-DD HH:MM:SS' text, which sorts like the dates
+            start, end = values
+            if start is not None:
+                clauses.append(f'{_quote(column)} >= ?')
+                params.append(str(pd.Timestamp(start)))
+            if end is not None:
+                clauses.append(f'{_quote(column)} <= ?')
+                params.append(str(pd.Timestamp(end)))
+        else:
+            clauses.append(f'{_quote(column)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+    clauses.extend(f'{_quote(column)} IS NOT NULL' for column in not_null)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def _query(connection, select, filters, group_by, keep_missing=False):
+    # SELECT select FROM events, filtered and grouped (and sorted) by group_by. Rows missing
+    # a group_by value are skipped unless keep_missing is set.
+    where, params = _where(filters, () if keep_missing else group_by)
+    group_by = ', '.join(map(_quote, group_by))
+    sql = f'SELECT {", ".join(select)} FROM events{where} GROUP BY {group_by} ORDER BY {group_by}'
+    return pd.read_sql_query(sql, connection, params=params)
+
+
+def _in_cells(columns):
+    return set(columns) <= set(CELL_COLUMNS)
+
+
+def store_partial(connection, filters=None, metrics=None):
+    # Partial aggregates (as returned by aggregations.partial_metrics, with distinct counts
+    # in place of the sets of distinct values) of the stored rows
+    # matching filters, for the named metrics. Raises ValueError when filters match no rows.
+    filters = filters or {}
+    plan = plan_partial(metrics)
+    where, params = _where(filters)
+    rows = connection.execute(f'SELECT COUNT(*) FROM events{where}', params).fetchone()[0]
+    if filters and not rows:
+        raise ValueError('No events match the report filters')
+
+    partial = {'groups': {}, 'distinct': {}, 'distinct_counts': {}, 'counts': {}}
+    distinct = {name: DISTINCT_METRICS[name] for name in plan['distinct']}
+    counts = {name: _columns(VALUE_COUNTS[name]) for name in plan['counts']}
+    needs_cells = (plan['groups'] or plan['totals']
+                   or any(_in_cells(_columns(key) + [column]) for key, column in distinct.values())
+                   or any(_in_cells(columns) for columns in counts.values()))
+    if needs_cells:
+        select = [_quote(column) for column in CELL_COLUMNS] + [
+            f'{SQL_AGGREGATES[function].format(_quote(column))} AS {_quote(name)}'
+            for name, (column, function) in CELL_MEASURES.items()]
+        # Cells missing a key are kept, and left out of the groupings by that key below
+        cells = _query(connection, select, filters, CELL_COLUMNS, keep_missing=True)
+
+    for key, group_metrics in GROUP_METRICS.items():
+        if key in plan['groups']:
+            partial['groups'][key] = cells.groupby(key)[list(group_metrics)].sum()
+    for name, (key, column) in distinct.items():
+        keys = _columns(key)
+        if _in_cells(keys + [column]):
+            # A missing value counts as one more, as it does in the sets of distinct values
+            partial['distinct_counts'][name] = cells.groupby(key)[column].nunique(dropna=False)
+        else:
+            # Counted in SQL, exactly whatever REPORT_DISTINCT_MODE says, since no sets are
+            # held in memory
+            select = [_quote(c) for c in keys] + [
+                f'COUNT(DISTINCT {_quote(column)}) + MAX({_quote(column)} IS NULL) AS "count"']
+            partial['distinct_counts'][name] = (_query(connection, select, filters, keys)
+                                                .set_index(key)['count'].rename(column))
+    for name, columns in counts.items():
+        if _in_cells(columns):
+            partial['counts'][name] = cells.groupby(columns)['rows'].sum().rename(None)
+        else:
+            select = [_quote(c) for c in columns] + ['COUNT(*) AS "count"']
+            partial['counts'][name] = (_query(connection, select, filters, columns)
+                                       .set_index(columns)['count'].rename(None))
+    if plan['totals']:
+        partial['totals'] = {
+            'revenue': cells['revenue'].sum(),
+            'min_price': cells['min_price'].min(),
+            'max_price': cells['max_price'].max(),
+        }
+    return partial, rows
+
+
+def store_metrics(store_path=EVENT_STORE_PATH, filters=None, metrics=None):
+    # The named metrics (all of them when None) of the stored rows matching filters
+    with span('store_query') as record, closing(_connect(store_path)) as connection:
+        partial, record['rows'] = store_partial(connection, filters, metrics)
+    with span('aggregate', rows=record['rows']):
+        return finalize_metrics(partial, metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load the cleaned event rows into the local SQLite event store.')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH,
+                        help='CSV file, or directory or glob pattern of partition files')
+    parser.add_argument('--store', default=EVENT_STORE_PATH)
+    args = parser.parse_args()
+    rows = ingest_events(args.data, args.store)
+    print(f'Stored {rows} rows from {args.data} in {args.store}')
+
+
+if __name__ == '__main__':
+    main()
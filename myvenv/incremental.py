@@ -0,0 +1,257 @@
+import hashlib
+import io
+import os
+import pickle
+
+import numpy as np
+
+from aggregations import finalize_metrics
+from ingestion import (AGE_COLUMNS, DEFAULT_CHUNK_SIZE, DEFAULT_DATA_PATH, age_fill_value, age_totals,
+                       aggregate_events, price_bounds_from_digest, scan_events)
+from instrumentation import span
+from schema import read_event_csv
+from sketches import empty_digest
+from storage import AGGREGATION_SETTINGS, AGGREGATION_SOURCES, atomic_write, code_version
+
+# Keeps the merged partial aggregates of Data/event.csv on disk together with the byte
+# offset they cover, so that when the export appends rows only the new bytes are read,
+# cleaned and merged into the stored state.
+#
+# Two cleaning steps depend on the whole file: missing ages are filled with the mean age
+# and ticket prices outside the IQR bounds are dropped. The state keeps what is needed to
+# recompute both (age sum and count, a digest of the ticket prices). When new rows move the
+# IQR bounds, or change the fill value while earlier rows were missing their age, the
+# stored aggregates no longer match and the state is rebuilt from the whole file.
+#
+# The state also keeps a hash of every byte it covers, so a file that was edited or
+# rewritten rather than appended to is rebuilt as well. Checking it reads the whole file
+# (but parses only the new rows).
+#
+# A last row without a trailing newline may still be being written, so it is left out at
+# first. If the file is still the same (size and modification time) at the next run, the
+# row counts as complete; should the file then grow, the state is rebuilt, since the row
+# may have been continued.
+
+INCREMENTAL_STATE_FOLDER = os.environ.get('INCREMENTAL_STATE_FOLDER', 'Cache')
+# Bytes read at a time when hashing the file or looking for its last newline
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class _ByteRange(io.RawIOBase):
+    # Reads the CSV header followed by bytes [start, end) of the file, so a slice of rows
+    # can be parsed like a complete CSV
+    def __init__(self, path, header, start, end):
+        self._prefix = header
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._file.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _state_path(data_path):
+    prefix = hashlib.sha256(os.path.abspath(data_path).encode()).hexdigest()[:16]
+    return os.path.join(INCREMENTAL_STATE_FOLDER, f'metrics_{prefix}.pkl')
+
+
+def _code_version():
+    # Stored state is discarded whenever the cleaning or aggregation code, or the settings
+    # that decide what the state holds, change
+    return code_version(AGGREGATION_SOURCES + ['incremental.py'], AGGREGATION_SETTINGS)
+
+
+def _read_header(data_path):
+    with open(data_path, 'rb') as f:
+        return f.readline()
+
+
+def _complete_rows_end(data_path):
+    # Offset just past the last newline, so a row the exporter is still writing is left
+    # for the next run
+    size = os.path.getsize(data_path)
+    with open(data_path, 'rb') as f:
+        position = size
+        while position > 0:
+            start = max(0, position - READ_BLOCK_SIZE)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+def _ends_with_newline(data_path, offset):
+    with open(data_path, 'rb') as f:
+        f.seek(max(0, offset - 1))
+        return f.read(1) == b'\n'
+
+
+def _prefix_digests(data_path, offsets):
+    # Hash of bytes [0, offset) of the file for each of the ascending offsets, in one read
+    digest = hashlib.sha256()
+    digests = []
+    position = 0
+    with open(data_path, 'rb') as f:
+        for offset in offsets:
+            while position < offset:
+                block = f.read(min(READ_BLOCK_SIZE, offset - position))
+                if not block:
+                    break
+                digest.update(block)
+                position += len(block)
+            digests.append(digest.copy().hexdigest())
+    return digests
+
+
+def _empty_state(header):
+    return {
+        'version': _code_version(),
+        'header': header,
+        'offset': len(header),
+        'digest': None,
+        'rows': 0,
+        'age_sum': 0.0,
+        'age_count': 0,
+        'price_digest': empty_digest(),
+        'seen': np.empty(0, dtype=np.uint64),
+        'age_fill_value': np.nan,
+        'price_bounds': (np.nan, np.nan),
+        'partial': None,
+        # (size, mtime_ns) of the file when its last line had no newline and was left out,
+        # else None
+        'tail': None,
+        # Whether the last row covered had no newline
+        'open_row': False,
+    }
+
+
+def _load_state(data_path, header):
+    # Returns the stored state if it was computed for this header by this code, else None.
+    # Whether it describes a prefix of the file is checked by the caller.
+    try:
+        with open(_state_path(data_path), 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if state['version'] != _code_version() or state['header'] != header:
+        return None
+    return state
+
+
+def _save_state(data_path, state):
+    os.makedirs(INCREMENTAL_STATE_FOLDER, exist_ok=True)
+    # Publish atomically so a concurrent run never reads a half-written state
+    with atomic_write(_state_path(data_path)) as tmp_path, open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_range(data_path, header, start, end, chunksize, columns=None):
+    # An empty range still gives a chunk without rows, so a file with only its header has
+    # the (empty) aggregates stream_metrics gives it
+    byte_range = _ByteRange(data_path, header, start, max(start, end))
+    return read_event_csv(io.BufferedReader(byte_range), chunksize=chunksize, columns=columns)
+
+
+def _same(left, right):
+    return left == right or (np.isnan(left) and np.isnan(right))
+
+
+def _apply_rows(data_path, state, end, chunksize):
+    # Folds bytes [state['offset'], end) into state. Returns the new state, or None when
+    # the new rows invalidate the aggregates already stored.
+    header = state['header']
+    start = state['offset']
+    # Same passes as ingestion.stream_metrics, over the new rows only
+    with span('incremental_scan', rows=0) as record:
+        rows, age_sum, age_count = age_totals(_read_range(data_path, header, start, end, chunksize, AGE_COLUMNS))
+        record['rows'] = rows
+        rows += state['rows']
+        age_sum += state['age_sum']
+        age_count += state['age_count']
+        fill_value = age_fill_value(age_sum, age_count)
+        if (state['partial'] is not None and state['rows'] > state['age_count']
+                and not _same(state['age_fill_value'], fill_value)):
+            return None
+        prices, seen = scan_events(_read_range(data_path, header, start, end, chunksize), fill_value,
+                                   state['seen'], state['price_digest'])
+    price_bounds = price_bounds_from_digest(prices)
+
+    if state['partial'] is not None:
+        if not all(_same(old, new) for old, new in zip(state['price_bounds'], price_bounds)):
+            return None
+
+    with span('incremental_aggregate', rows=record['rows']):
+        partial, _ = aggregate_events(_read_range(data_path, header, start, end, chunksize), fill_value,
+                                      price_bounds, state['seen'], state['partial'])
+
+    return {
+        **state,
+        'offset': end,
+        'rows': rows,
+        'age_sum': age_sum,
+        'age_count': age_count,
+        'price_digest': prices,
+        'seen': seen,
+        'age_fill_value': fill_value,
+        'price_bounds': price_bounds,
+        'partial': partial,
+    }
+
+
+def incremental_metrics(data_path=DEFAULT_DATA_PATH, chunksize=None, metrics=None):
+    # Returns the report metrics for data_path, reading only the rows appended since the
+    # last call. Rows are picked up once their line ends with a newline, or once the file
+    # is found unchanged after a last line without one. The stored state always covers
+    # every metric, so later runs can ask for any of them.
+    chunksize = chunksize or DEFAULT_CHUNK_SIZE
+    header = _read_header(data_path)
+    stat = os.stat(data_path)
+    end = max(_complete_rows_end(data_path), len(header))
+    tail = (stat.st_size, stat.st_mtime_ns) if end < stat.st_size else None
+
+    state = _load_state(data_path, header)
+    if tail is not None and state is not None and state['tail'] == tail:
+        # The last line is the same as at the previous run: the writer is done with it
+        end = stat.st_size
+        tail = None
+    open_row = end == stat.st_size and not _ends_with_newline(data_path, end)
+    if state is not None and (state['offset'] > end or (state['open_row'] and state['offset'] < end)):
+        # Rows were removed, or the last row the state covers may have been continued
+        state = None
+    if state is not None:
+        checkpoint, digest = _prefix_digests(data_path, [state['offset'], end])
+        if checkpoint != state['digest']:
+            # Bytes the state covers were changed
+            state = None
+    else:
+        digest, = _prefix_digests(data_path, [end])
+    if state is None or state['offset'] < end:
+        if state is not None:
+            state = _apply_rows(data_path, state, end, chunksize)
+        if state is None:
+            # No usable checkpoint, or the new rows changed how earlier rows are cleaned
+            state = _apply_rows(data_path, _empty_state(header), end, chunksize)
+        state.update(digest=digest, tail=tail, open_row=open_row)
+        _save_state(data_path, state)
+    elif state['tail'] != tail:
+        state['tail'] = tail
+        _save_state(data_path, state)
+    return finalize_metrics(state['partial'], metrics)
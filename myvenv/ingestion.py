@@ -0,0 +1,186 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregations import partial_metrics, merge_partial_metrics, finalize_metrics
+from schema import AGE_BINS, AGE_LABELS, CATEGORY_COLUMNS, DATE_FORMAT, partition_paths, read_event_csv
+from instrumentation import span
+from sketches import digest_quantile, empty_digest, merge_digests, quantile_digest
+
+DEFAULT_DATA_PATH = os.path.join('Data', 'event.csv')
+# Rows per chunk when the CSV is streamed instead of loaded at once
+DEFAULT_CHUNK_SIZE = 500_000
+# The only column age_totals needs
+AGE_COLUMNS = ['Attendee Age']
+# Centroids kept by the ticket price digest behind the IQR outlier bounds (see sketches.py);
+# the bounds are exact while there are at most this many distinct prices
+PRICE_DIGEST_COMPRESSION = int(os.environ.get('REPORT_QUANTILE_COMPRESSION', 200))
+
+
+def prepare_events(df, age_fill_value=None):
+    # Handling Missing Data
+    # Fill missing values (customized based on the column type)
+    if age_fill_value is not None:
+        df['Attendee Age'] = df['Attendee Age'].fillna(age_fill_value)  # Fill numeric columns with mean
+    df['Attendee Contact Information'] = df['Attendee Contact Information'].fillna('Unknown')  # Fill categorical columns with 'Unknown'
+
+    # Converting Data Types
+    # Event Date is normally parsed by read_event_csv already; invalid dates become NaT
+    df['Event Date'] = pd.to_datetime(df['Event Date'], format=DATE_FORMAT, errors='coerce')
+    # Always float64, whatever the values of this chunk, so equal rows hash alike in every chunk
+    df['Ticket Price'] = pd.to_numeric(df['Ticket Price'], errors='coerce').astype('float64')  # Ensure Ticket Price is numeric
+    df['Attendee Age'] = pd.to_numeric(df['Attendee Age'], errors='coerce').astype('float64')  # Ensure Age is numeric
+    return df
+
+
+def finish_events(df, price_bounds):
+    # Encoding Categorical Data
+    df['Attendee Gender'] = df['Attendee Gender'].map({'Male': 1, 'Female': 0})  # Binary encoding for gender
+
+    # Creating New Features
+    # Extracting year and month from Event Date
+    df['Event Year'] = df['Event Date'].dt.year
+    df['Event Month'] = df['Event Date'].dt.month
+
+    # Age Grouping
+    df['Age Group'] = pd.cut(df['Attendee Age'], bins=AGE_BINS, labels=AGE_LABELS, include_lowest=True)
+
+    # Outlier Detection and Treatment
+    # Remove outliers using IQR for 'Ticket Price'
+    lower, upper = price_bounds
+    df = df[~((df['Ticket Price'] < lower) | (df['Ticket Price'] > upper))].copy()
+
+    # Cap outliers for 'Attendee Age'
+    df['Attendee Age'] = df['Attendee Age'].clip(lower=18, upper=100)
+    return df
+
+
+def iqr_bounds(q1, q3):
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def price_digest(df):
+    return quantile_digest(df['Ticket Price'], PRICE_DIGEST_COMPRESSION)
+
+
+def merge_price_digests(left, right):
+    return merge_digests(left, right, PRICE_DIGEST_COMPRESSION)
+
+
+def price_bounds_from_digest(digest):
+    # IQR outlier bounds of the ticket prices summarized by digest
+    return iqr_bounds(digest_quantile(digest, 0.25), digest_quantile(digest, 0.75))
+
+
+def read_events(data_path=DEFAULT_DATA_PATH):
+    # All rows of data_path; partition files (see schema.partition_paths) are concatenated
+    paths = partition_paths(data_path)
+    if not paths:
+        raise FileNotFoundError(f'No CSV files found at {data_path}')
+    if len(paths) == 1:
+        return read_event_csv(paths[0])
+    df = pd.concat([read_event_csv(path) for path in paths], ignore_index=True)
+    # Each file has categories of its own, which concat turns back into text
+    return df.astype({column: 'category' for column in CATEGORY_COLUMNS})
+
+
+def load_events(data_path=DEFAULT_DATA_PATH):
+    # Read the whole CSV file (or all partition files) and clean it in memory
+    with span('load') as record:
+        df = read_events(data_path)
+        record['rows'] = len(df)
+    with span('clean', rows=len(df)):
+        return clean_events(df)
+
+
+def clean_events(df):
+    df = prepare_events(df, age_fill_value=pd.to_numeric(df['Attendee Age'], errors='coerce').mean())
+
+    # Handling Duplicates
+    df.drop_duplicates(inplace=True)
+
+    df = finish_events(df, price_bounds_from_digest(price_digest(df)))
+
+    # Sorting data by Event Date for time-series visualizations
+    df.sort_values(by='Event Date', inplace=True)
+    return df
+
+
+def drop_seen_rows(chunk, seen):
+    # Removes rows already seen in this chunk or an earlier one. Rows are tracked by a
+    # 64-bit hash, so the state kept between chunks is a sorted array of 8 bytes per
+    # distinct row: it grows with the rows of the file, not with the chunk size. Lookups
+    # are binary searches and new hashes are merged in at their sorted positions, so the
+    # array is never sorted again.
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    keep = ~chunk.duplicated().to_numpy()
+    if len(seen):
+        keep &= seen[np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)] != hashes
+    new = np.sort(hashes[keep])
+    return chunk[keep], np.insert(seen, np.searchsorted(seen, new), new)
+
+
+# The cleaning steps of clean_events over chunks of rows, in three passes, each given what
+# the ones before found in all the rows (of a file, its partitions or the rows appended to
+# it): age_totals for the fill value of missing ages (their mean, duplicates included),
+# scan_events for the ticket price IQR bounds of the distinct rows, and aggregate_events,
+# which cleans the chunks and folds them into mergeable partial aggregates. Both of the last
+# passes fill missing ages before dropping duplicates, as clean_events does.
+# stream_metrics below, incremental.py and partitions.py all clean rows this way.
+
+def age_totals(chunks):
+    # (rows, sum of the ages, number of ages) of chunks, which only need AGE_COLUMNS
+    rows = 0
+    age_sum = 0.0
+    age_count = 0
+    for chunk in chunks:
+        ages = pd.to_numeric(chunk['Attendee Age'], errors='coerce')
+        rows += len(chunk)
+        age_sum += ages.sum()
+        age_count += ages.count()
+    return rows, age_sum, age_count
+
+
+def age_fill_value(age_sum, age_count):
+    return age_sum / age_count if age_count else np.nan
+
+
+def scan_events(chunks, fill_value, seen=None, prices=None):
+    # Adds the ticket prices of the rows of chunks not in seen (row hashes, see
+    # drop_seen_rows) to the digest prices. Returns the digest and the hashes seen.
+    seen = np.empty(0, dtype=np.uint64) if seen is None else seen
+    prices = empty_digest() if prices is None else prices
+    for chunk in chunks:
+        chunk, seen = drop_seen_rows(prepare_events(chunk, fill_value), seen)
+        prices = merge_price_digests(prices, price_digest(chunk))
+    return prices, seen
+
+
+def aggregate_events(chunks, fill_value, price_bounds, seen=None, partial=None, metrics=None):
+    # Cleans the rows of chunks not in seen and merges their partial aggregates of the named
+    # metrics into partial. Returns the partial aggregates (None when there were no
+    # chunks) and the hashes seen.
+    seen = np.empty(0, dtype=np.uint64) if seen is None else seen
+    for chunk in chunks:
+        chunk, seen = drop_seen_rows(prepare_events(chunk, fill_value), seen)
+        chunk_partial = partial_metrics(finish_events(chunk, price_bounds), metrics)
+        partial = chunk_partial if partial is None else merge_partial_metrics(partial, chunk_partial)
+    return partial, seen
+
+
+def stream_metrics(data_path=DEFAULT_DATA_PATH, chunksize=DEFAULT_CHUNK_SIZE, metrics=None):
+    # Computes the report metrics without holding the whole file in memory, reading it
+    # once for each pass of the cleaning steps
+    with span('stream_scan', rows=0) as record:
+        rows, age_sum, age_count = age_totals(read_event_csv(data_path, chunksize=chunksize, columns=AGE_COLUMNS))
+        record['rows'] = rows
+        fill_value = age_fill_value(age_sum, age_count)
+        prices, _ = scan_events(read_event_csv(data_path, chunksize=chunksize), fill_value)
+    price_bounds = price_bounds_from_digest(prices)
+
+    with span('stream_aggregate', rows=rows):
+        partial, _ = aggregate_events(read_event_csv(data_path, chunksize=chunksize), fill_value, price_bounds,
+                                      metrics=metrics)
+        return finalize_metrics(partial, metrics)
@@ -0,0 +1,137 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, only needed for the peak on Windows
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Named spans (duration, peak RSS, rows processed) recorded for each report run, and the
+# per-stage latency histograms served by the /metrics endpoint in Prometheus text format.
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Spans of the run in progress in this process, or None when nothing is being recorded
+_active_spans = None
+
+
+def _peak_rss_bytes():
+    # High-water mark of the process's resident memory. It never goes down, so the span
+    # that raised it is the one whose value is higher than the span before it.
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    # Windows: only the peak working set is a high-water mark, not the current RSS
+    if psutil is not None:
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None
+
+
+@contextmanager
+def span(name, rows=None):
+    # Records how long the block takes. Yields the span record, so rows can be filled in
+    # once they are known. Does nothing outside collect_spans().
+    record = {'stage': name, 'rows': rows}
+    if _active_spans is None:
+        yield record
+        return
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['peak_rss_bytes'] = _peak_rss_bytes()
+        _active_spans.append(record)
+
+
+@contextmanager
+def collect_spans():
+    # Collects the spans recorded inside the block into the yielded list
+    global _active_spans
+    previous = _active_spans
+    _active_spans = []
+    try:
+        yield _active_spans
+    finally:
+        _active_spans = previous
+
+
+def add_spans(spans):
+    # Adds spans recorded elsewhere (e.g. in a chart worker process) to the current run
+    if _active_spans is not None:
+        _active_spans.extend(spans)
+
+
+_metrics_lock = threading.Lock()
+_stage_histograms = {}
+_stage_rows = {}
+_stage_peak_rss = {}
+_runs_total = {}
+
+
+def observe_run(spans, status='finished'):
+    # Folds the spans of one finished run into the /metrics histograms
+    with _metrics_lock:
+        _runs_total[status] = _runs_total.get(status, 0) + 1
+        for record in spans:
+            stage = record['stage']
+            histogram = _stage_histograms.setdefault(stage, {'buckets': [0] * len(DURATION_BUCKETS),
+                                                             'sum': 0.0, 'count': 0})
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if record['seconds'] <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += record['seconds']
+            histogram['count'] += 1
+            if record.get('rows') is not None:
+                _stage_rows[stage] = _stage_rows.get(stage, 0) + int(record['rows'])
+            if record.get('peak_rss_bytes') is not None:
+                _stage_peak_rss[stage] = record['peak_rss_bytes']
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_metrics():
+    with _metrics_lock:
+        lines = [
+            '# HELP report_runs_total Report generation runs by outcome.',
+            '# TYPE report_runs_total counter',
+        ]
+        for status, count in sorted(_runs_total.items()):
+            lines.append(f'report_runs_total{{status="{_label(status)}"}} {count}')
+
+        lines += [
+            '# HELP report_stage_duration_seconds Duration of each report generation stage.',
+            '# TYPE report_stage_duration_seconds histogram',
+        ]
+        for stage, histogram in sorted(_stage_histograms.items()):
+            stage_label = _label(stage)
+            for bound, count in zip(DURATION_BUCKETS, histogram['buckets']):
+                lines.append(f'report_stage_duration_seconds_bucket{{stage="{stage_label}",le="{bound}"}} {count}')
+            lines.append(f'report_stage_duration_seconds_bucket{{stage="{stage_label}",le="+Inf"}} '
+                         f'{histogram["count"]}')
+            lines.append(f'report_stage_duration_seconds_sum{{stage="{stage_label}"}} {histogram["sum"]}')
+            lines.append(f'report_stage_duration_seconds_count{{stage="{stage_label}"}} {histogram["count"]}')
+
+        lines += [
+            '# HELP report_stage_rows_total Rows processed by each report generation stage.',
+            '# TYPE report_stage_rows_total counter',
+        ]
+        for stage, rows in sorted(_stage_rows.items()):
+            lines.append(f'report_stage_rows_total{{stage="{_label(stage)}"}} {rows}')
+
+        lines += [
+            '# HELP report_stage_peak_rss_bytes Peak resident memory of the process at the end of the last run of each stage.',
+            '# TYPE report_stage_peak_rss_bytes gauge',
+        ]
+        for stage, peak in sorted(_stage_peak_rss.items()):
+            lines.append(f'report_stage_peak_rss_bytes{{stage="{_label(stage)}"}} {peak}')
+    return '\n'.join(lines) + '\n'
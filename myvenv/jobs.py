@@ -0,0 +1,277 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from artifacts import publish_report
+import schema
+from instrumentation import collect_spans, observe_run, span
+from report_spec import SECTIONS
+from summaries import compute_summaries, load_stored_summaries, store_summaries
+
+# report_generator (pandas, matplotlib, seaborn, python-docx) is only imported in the
+# worker processes, so the web process starts without the data stack
+
+# CSV the reports are generated from, or a directory or glob pattern of partition files
+DATA_PATH = os.environ.get('REPORT_DATA_PATH', os.path.join('Data', 'event.csv'))
+# Number of reports that may be generated at the same time
+MAX_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+# Number of queued or running jobs accepted before new requests are rejected
+MAX_PENDING_JOBS = int(os.environ.get('REPORT_MAX_PENDING', 20))
+# Number of finished jobs kept around so their reports can still be downloaded
+MAX_FINISHED_JOBS = int(os.environ.get('REPORT_MAX_FINISHED', 50))
+# Chart rendering (and partition processing) processes per job, split so concurrent jobs
+# don't oversubscribe the CPUs
+CHART_WORKERS = max(1, (os.cpu_count() or 1) // MAX_WORKERS)
+# Stream the CSV in chunks of this many rows instead of loading it at once (0 = load at once)
+CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 0)) or None
+# Keep the aggregates on disk and only read rows appended to the CSV since the previous job
+INCREMENTAL = os.environ.get('REPORT_INCREMENTAL', '1') != '0'
+# 'native' writes the PDF in-process, 'word' converts the DOCX with Microsoft Word via docx2pdf
+PDF_ENGINE = os.environ.get('REPORT_PDF_ENGINE', 'native')
+
+# Each job works in a scratch folder of its own, removed once its report is published
+# (default: the system temp folder)
+WORKSPACE_FOLDER = os.environ.get('REPORT_WORKSPACE_FOLDER') or None
+# Also save each job's chart PNGs to <folder>/<job_id>/, for debugging (default: charts stay in memory)
+CHARTS_EXPORT_FOLDER = os.environ.get('REPORT_CHARTS_FOLDER') or None
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+# Section summaries of the current CSV, and the worker computation in flight, if any
+_summaries = {'data_version': None, 'sections': None, 'future': None, 'executor': None}
+
+
+def _warm_worker():
+    # Runs once in every worker process when it starts: imports the report stack and
+    # renders a throwaway chart, so the first job a worker takes doesn't pay for either
+    import charts
+    import report_generator  # noqa: F401
+    charts.warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _get_executor():
+    # The pool is created on first use so importing this module stays cheap
+    # and spawned worker processes don't start pools of their own
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, initializer=_warm_worker)
+    return _executor
+
+
+def _discard_executor(executor):
+    # Called with _lock held once a worker process died: the pool is unusable from then on
+    # (its queued and running jobs fail with BrokenProcessPool), so the next submit starts
+    # a new one. A pool that was already replaced is left alone.
+    global _executor
+    if _executor is executor:
+        _executor = None
+        executor.shutdown(wait=False)
+
+
+def _submit(function, *args):
+    # Called with _lock held. Returns the future and the pool it was submitted to.
+    executor = _get_executor()
+    try:
+        return executor.submit(function, *args), executor
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor = _get_executor()
+        return executor.submit(function, *args), executor
+
+
+def warm_up_workers():
+    # Starts the worker processes ahead of the first report request. Doesn't wait for them.
+    with _lock:
+        for _ in range(MAX_WORKERS):
+            _submit(_ping)
+
+
+def _run_report_job(job_id, filters=None, sections=None):
+    # Each job writes into its own workspace so concurrent jobs don't overwrite each other.
+    # The stage spans are sent back with the result, since the job runs in a worker process.
+    if WORKSPACE_FOLDER:
+        os.makedirs(WORKSPACE_FOLDER, exist_ok=True)
+    workspace = tempfile.mkdtemp(prefix=f'report_{job_id}_', dir=WORKSPACE_FOLDER)
+    try:
+        from report_generator import generate_report
+        with collect_spans() as spans:
+            pdf_path = generate_report(data_path=DATA_PATH,
+                                       charts_folder=os.path.join(CHARTS_EXPORT_FOLDER, job_id)
+                                       if CHARTS_EXPORT_FOLDER else None,
+                                       report_folder=os.path.join(workspace, 'Report'),
+                                       chart_workers=CHART_WORKERS,
+                                       chunksize=CHUNK_SIZE,
+                                       pdf_engine=PDF_ENGINE,
+                                       incremental=INCREMENTAL,
+                                       filters=filters,
+                                       sections=sections,
+                                       partition_workers=CHART_WORKERS)
+            # Downloads are served from the published copy, named by its content hash
+            with span('publish'):
+                artifact_path = publish_report(pdf_path)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    return artifact_path, spans
+
+
+def _data_version():
+    return schema.data_version(DATA_PATH)
+
+
+def _request_key(filters, sections=None):
+    # Requests with the same key would produce the same report: same filters and
+    # sections, same CSV
+    return json.dumps([filters or {}, sections, _data_version()], sort_keys=True, default=str)
+
+
+def _refresh_summaries(data_version):
+    # Runs in a worker process
+    sections = compute_summaries(DATA_PATH, chunksize=CHUNK_SIZE, incremental=INCREMENTAL,
+                                 partition_workers=CHART_WORKERS)
+    store_summaries(DATA_PATH, data_version, sections)
+    return sections
+
+
+def get_summaries():
+    # {section: summary} of the current CSV (see summaries.py). Answered from memory or
+    # the stored file while the CSV is unchanged; otherwise a worker recomputes them,
+    # once, however many requests are waiting.
+    data_version = _data_version()
+    with _lock:
+        if _summaries['data_version'] == data_version and _summaries['sections'] is not None:
+            return _summaries['sections']
+        if _summaries['data_version'] != data_version or _summaries['future'] is None:
+            sections = load_stored_summaries(DATA_PATH, data_version)
+            _summaries.update(data_version=data_version, sections=sections, future=None)
+            if sections is not None:
+                return sections
+            _summaries['future'], _summaries['executor'] = _submit(_refresh_summaries, data_version)
+        future = _summaries['future']
+        executor = _summaries['executor']
+    try:
+        sections = future.result()
+    except Exception as error:
+        with _lock:
+            if isinstance(error, BrokenProcessPool):
+                _discard_executor(executor)
+            if _summaries['future'] is future:
+                _summaries['future'] = None
+        raise
+    with _lock:
+        if _summaries['future'] is future:
+            _summaries.update(sections=sections, future=None)
+    return sections
+
+
+def _job_status(job):
+    # A job only counts as done once its result has been recorded by _on_job_done
+    if job['finished_at'] is None:
+        return 'running' if job['future'].running() or job['future'].done() else 'queued'
+    return 'failed' if job['error'] is not None else 'finished'
+
+
+def _on_job_done(job_id, executor, future):
+    with _lock:
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            _discard_executor(executor)
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job['finished_at'] = datetime.now()
+        if future.cancelled():
+            job['error'] = 'Job was cancelled'
+        elif isinstance(future.exception(), BrokenProcessPool):
+            job['error'] = 'A report worker process stopped unexpectedly'
+        elif future.exception() is not None:
+            job['error'] = str(future.exception())
+        else:
+            job['pdf_path'], job['stages'] = future.result()
+        _prune_finished_jobs()
+    observe_run(job['stages'], 'failed' if job['error'] is not None else 'finished')
+
+
+def _prune_finished_jobs():
+    # Drop the oldest finished jobs once more than MAX_FINISHED_JOBS are kept
+    finished = [job for job in _jobs.values() if job['finished_at'] is not None]
+    finished.sort(key=lambda job: job['finished_at'])
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job['id']]
+
+
+def submit_report_job(filters=None, sections=None):
+    # filters restrict the report to part of the data, see report_filters.parse_report_filters,
+    # and sections to some of its sections, see report_spec.parse_sections.
+    # A request identical to a job still queued or running joins that job instead of
+    # starting another one, and gets its job_id.
+    key = _request_key(filters, sections)
+    with _lock:
+        for job in _jobs.values():
+            if job['key'] == key and job['finished_at'] is None:
+                job['requests'] += 1
+                return job['id']
+
+        pending = sum(1 for job in _jobs.values() if job['finished_at'] is None)
+        if pending >= MAX_PENDING_JOBS:
+            raise JobQueueFull(f'Too many report jobs in progress ({pending})')
+
+        job_id = uuid.uuid4().hex
+        future, executor = _submit(_run_report_job, job_id, filters, sections)
+        _jobs[job_id] = {
+            'id': job_id,
+            'key': key,
+            'requests': 1,
+            'future': future,
+            'created_at': datetime.now(),
+            'finished_at': None,
+            'pdf_path': None,
+            'error': None,
+            'stages': [],
+            # Unfiltered and with every section, so /download_report may serve it
+            'full_report': not filters and (sections is None or set(sections) == set(SECTIONS)),
+        }
+    future.add_done_callback(lambda f: _on_job_done(job_id, executor, f))
+    return job_id
+
+
+def get_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {
+            'id': job['id'],
+            'status': _job_status(job),
+            'created_at': job['created_at'].isoformat(),
+            'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+            'pdf_path': job['pdf_path'],
+            'error': job['error'],
+            'stages': job['stages'],
+            'requests': job['requests'],
+        }
+
+
+def latest_finished_job():
+    # The most recently finished full report; filtered reports and reports limited to some
+    # sections are only served by their own job
+    with _lock:
+        finished = [job for job in _jobs.values() if job['pdf_path'] is not None and job['full_report']]
+        if not finished:
+            return None
+        job_id = max(finished, key=lambda job: job['finished_at'])['id']
+    return get_job(job_id)
@@ -0,0 +1,201 @@
+import glob
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from aggregations import merge_partial_metrics, finalize_metrics
+from ingestion import (AGE_COLUMNS, age_fill_value, age_totals, aggregate_events, merge_price_digests,
+                       price_bounds_from_digest, scan_events)
+from instrumentation import span, collect_spans, add_spans
+from schema import partition_paths, read_event_csv
+from sketches import empty_digest
+from storage import AGGREGATION_SETTINGS, AGGREGATION_SOURCES, atomic_write, code_version
+
+# Report metrics of data split into partition files (see schema.partition_paths), computed
+# as a map-reduce: every partition is cleaned and aggregated in a worker process of its own
+# and the partial aggregates are merged, which gives the same metrics as cleaning the
+# concatenated files.
+#
+# The cleaning steps that depend on all the data are handled like ingestion.stream_metrics
+# does for chunks, with one pass over every partition in each phase:
+# - ages: the row count and the age sum and count of the partition, for the fill value of
+#   missing ages.
+# - scan: a digest of the ticket prices and the hashes of the partition's distinct rows.
+#   Rows already present in an earlier partition are then left out of it, and its prices
+#   are digested again without them.
+# - aggregate: the partial aggregates of the partition, cleaned with the fill value for
+#   missing ages and the price outlier bounds of all partitions.
+#
+# The results are kept in Cache/ per partition file. Adding a partition only reads the
+# new file, unless it changes the fill value for the missing ages of the others (which are
+# then scanned again) or moves the price bounds (the others are aggregated again).
+
+PARTITION_CACHE_FOLDER = os.environ.get('PARTITION_CACHE_FOLDER', 'Cache')
+
+
+def _version():
+    # Cached results are discarded whenever the cleaning or aggregation code, or the settings
+    # that decide what a partial aggregate holds, change
+    return code_version(AGGREGATION_SOURCES + ['partitions.py'], AGGREGATION_SETTINGS)
+
+
+def _file_key(path, *parts):
+    # Changes whenever the partition file, the code or any of parts changes
+    stat = os.stat(path)
+    digest = hashlib.sha256(f'{stat.st_size}/{stat.st_mtime_ns}/{_version()}'.encode())
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_path(kind, path, key):
+    prefix = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(PARTITION_CACHE_FOLDER, f'partition_{kind}_{prefix}_{key}.pkl')
+
+
+def _load_cached(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _store_cached(cache_path, value):
+    os.makedirs(PARTITION_CACHE_FOLDER, exist_ok=True)
+    with atomic_write(cache_path) as tmp_path, open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Drop the entries of earlier versions of the same file
+    for stale_path in glob.glob(f'{cache_path.rsplit("_", 1)[0]}_*.pkl'):
+        if stale_path != cache_path:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+
+
+def _read_partition(path, chunksize, columns=None):
+    if chunksize:
+        return read_event_csv(path, chunksize=chunksize, columns=columns)
+    return [read_event_csv(path, columns=columns)]
+
+
+def partition_ages(path, chunksize=None):
+    # First pass over one partition. Returns the result and the spans recorded, so both can
+    # be sent back from a worker process.
+    with collect_spans() as spans:
+        with span('partition_ages') as record:
+            rows, age_sum, age_count = age_totals(_read_partition(path, chunksize, AGE_COLUMNS))
+            record['rows'] = rows
+    return {'rows': rows, 'age_sum': age_sum, 'age_count': age_count}, spans
+
+
+def scan_partition(path, chunksize, fill_value, exclude=None):
+    # Second pass over one partition, leaving out rows whose hash is in exclude. Returns the
+    # result with the spans recorded.
+    exclude = np.empty(0, dtype=np.uint64) if exclude is None else exclude
+    with collect_spans() as spans:
+        with span('partition_scan'):
+            prices, seen = scan_events(_read_partition(path, chunksize), fill_value, exclude)
+    scan = {
+        'price_digest': prices,
+        'hashes': np.setdiff1d(seen, exclude, assume_unique=True),
+    }
+    return scan, spans
+
+
+def aggregate_partition(path, chunksize, exclude, fill_value, price_bounds):
+    # Last pass over one partition: the partial aggregates of every metric over its rows,
+    # cleaned like the rows of all partitions. Returns them with the spans recorded.
+    with collect_spans() as spans:
+        with span('partition_aggregate'):
+            partial, _ = aggregate_events(_read_partition(path, chunksize), fill_value, price_bounds, exclude)
+    return partial, spans
+
+
+def _run_all(function, calls, max_workers=None):
+    # function(*args) for every args of calls, in worker processes when there are several.
+    # Returns the results in order and adds the workers' spans to the current run.
+    max_workers = min(max_workers or os.cpu_count() or 1, len(calls))
+    if max_workers <= 1:
+        results = [function(*args) for args in calls]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(function, *args) for args in calls]
+            # result() re-raises any error from the worker that processed the partition
+            results = [future.result() for future in futures]
+    for _, spans in results:
+        add_spans(spans)
+    return [result for result, _ in results]
+
+
+def _cached_map(kind, function, calls, keys, max_workers=None):
+    # Like _run_all, reading the result of each call from the cache when its key matches and
+    # storing the others. A key of None is never cached.
+    results = {}
+    for index, (args, key) in enumerate(zip(calls, keys)):
+        if key is not None:
+            cached = _load_cached(_cache_path(kind, args[0], key))
+            if cached is not None:
+                results[index] = cached
+    missing = [index for index in range(len(calls)) if index not in results]
+    for index, result in zip(missing, _run_all(function, [calls[index] for index in missing], max_workers)):
+        results[index] = result
+        if keys[index] is not None:
+            _store_cached(_cache_path(kind, calls[index][0], keys[index]), result)
+    return [results[index] for index in range(len(calls))]
+
+
+def partitioned_metrics(data_path, chunksize=None, metrics=None, max_workers=None):
+    # The report metrics of the partition files behind data_path, with up to max_workers
+    # partitions processed at a time (default: one per CPU). chunksize streams each
+    # partition in chunks of that many rows. The cached partials always cover every metric,
+    # so later runs can ask for any of them.
+    paths = partition_paths(data_path)
+    if not paths:
+        raise FileNotFoundError(f'No CSV files found at {data_path}')
+
+    with span('partitioned_scan', rows=0) as record:
+        ages = _cached_map('ages', partition_ages, [(path, chunksize) for path in paths],
+                           [_file_key(path) for path in paths], max_workers)
+        record['rows'] = sum(partition['rows'] for partition in ages)
+        fill_value = age_fill_value(sum(partition['age_sum'] for partition in ages),
+                                    sum(partition['age_count'] for partition in ages))
+        # A partition's rows only depend on the fill value when it has missing ages
+        fills = [partition['rows'] > partition['age_count'] and fill_value for partition in ages]
+
+        scans = _cached_map('scan', scan_partition, [(path, chunksize, fill_value) for path in paths],
+                            [_file_key(path, fill) for path, fill in zip(paths, fills)], max_workers)
+
+        # Rows of a partition that an earlier one already holds are dropped from it
+        seen = np.empty(0, dtype=np.uint64)
+        excludes = []
+        for scan in scans:
+            excludes.append(scan['hashes'][np.isin(scan['hashes'], seen)])
+            seen = np.union1d(seen, scan['hashes'])
+        del seen
+        overlapping = [index for index, exclude in enumerate(excludes) if len(exclude)]
+        rescans = _run_all(scan_partition,
+                           [(paths[index], chunksize, fill_value, excludes[index]) for index in overlapping],
+                           max_workers)
+        prices = empty_digest()
+        for index, scan in enumerate(scans):
+            if index in overlapping:
+                scan = rescans[overlapping.index(index)]
+            prices = merge_price_digests(prices, scan['price_digest'])
+    price_bounds = price_bounds_from_digest(prices)
+
+    with span('partitioned_aggregate', rows=record['rows']):
+        keys = [_file_key(path, exclude.tobytes(), fill, price_bounds)
+                for path, exclude, fill in zip(paths, excludes, fills)]
+        partials = _cached_map('partial', aggregate_partition,
+                               [(path, chunksize, exclude, fill_value, price_bounds)
+                                for path, exclude in zip(paths, excludes)], keys, max_workers)
+        partial = None
+        for partition_partial in partials:
+            if partition_partial is not None:
+                partial = partition_partial if partial is None else merge_partial_metrics(partial, partition_partial)
+        return finalize_metrics(partial, metrics)
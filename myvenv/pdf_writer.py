@@ -0,0 +1,199 @@
+import zlib
+
+from PIL import Image
+
+from report_document import picture_source
+
+# Writes a ReportContent straight to PDF using the standard Helvetica fonts, so no
+# word processor is needed to produce the PDF.
+
+PAGE_WIDTH = 612  # US Letter, in points, same as the python-docx default template
+PAGE_HEIGHT = 792
+MARGIN = 72
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+# Glyph widths (1/1000 em) of the printable ASCII characters, from the Adobe AFM metrics
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+FONTS = {
+    'F1': ('Helvetica', HELVETICA_WIDTHS),
+    'F2': ('Helvetica-Bold', HELVETICA_BOLD_WIDTHS),
+}
+
+# font, size, colour, space before, space after, modelled on the default Word styles
+PARAGRAPH_STYLE = ('F1', 11, (0, 0, 0), 0, 10)
+HEADING_STYLES = {
+    0: ('F1', 26, (23, 54, 93), 0, 15),
+    1: ('F2', 14, (54, 95, 145), 24, 6),
+    2: ('F2', 13, (79, 129, 189), 10, 6),
+}
+LINE_SPACING = 1.15
+
+
+def _text_width(text, font, size):
+    widths = FONTS[font][1]
+    return sum(widths[ord(char) - 32] if 32 <= ord(char) < 127 else 556 for char in text) * size / 1000
+
+
+def _wrap(text, font, size, max_width):
+    lines = []
+    line = ''
+    # Splitting on single spaces keeps runs of spaces in the text
+    for word in text.split(' '):
+        candidate = f'{line} {word}' if line else word
+        if line and _text_width(candidate, font, size) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return lines
+
+
+def _pdf_string(text):
+    encoded = text.encode('cp1252', 'replace')
+    return b'(' + encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _color(rgb):
+    return ' '.join(f'{component / 255:.3f}' for component in rgb).encode()
+
+
+class _PdfLayout:
+    # Flows blocks down the page, starting a new page whenever the next line or picture doesn't fit
+    def __init__(self):
+        self.pages = []
+        self.images = []
+        self._new_page()
+
+    def _new_page(self):
+        self.operations = []
+        self.pages.append(self.operations)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def _ensure_space(self, height):
+        if self.y - height < MARGIN and self.y < PAGE_HEIGHT - MARGIN:
+            self._new_page()
+
+    def add_text(self, text, style, keep_with_next=0):
+        # keep_with_next is the height of the following block that must fit on the same page
+        font, size, rgb, space_before, space_after = style
+        leading = size * LINE_SPACING
+        if self.y < PAGE_HEIGHT - MARGIN:
+            self.y -= space_before
+        lines = _wrap(text, font, size, CONTENT_WIDTH)
+        for index, line in enumerate(lines):
+            self._ensure_space(leading + (space_after + keep_with_next if index == len(lines) - 1 else 0))
+            self.y -= leading
+            self.operations.append(b'BT /%s %d Tf %s rg %.2f %.2f Td %s Tj ET' % (
+                font.encode(), size, _color(rgb), MARGIN, self.y + (leading - size), _pdf_string(line)))
+        self.y -= space_after
+
+    def add_picture(self, picture):
+        pixel_width, pixel_height, data, width, height = picture
+        self._ensure_space(height)
+        self.y -= height
+        name = f'Im{len(self.images) + 1}'
+        self.images.append((name, pixel_width, pixel_height, data))
+        self.operations.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q' % (
+            width, height, MARGIN, self.y, name.encode()))
+        self.y -= PARAGRAPH_STYLE[4]
+
+
+def _load_picture(image, width_inches):
+    with Image.open(picture_source(image)) as picture:
+        picture = picture.convert('RGB')
+    pixel_width, pixel_height = picture.size
+    width = min(width_inches * 72, CONTENT_WIDTH)
+    height = min(width * pixel_height / pixel_width, PAGE_HEIGHT - 2 * MARGIN)
+    return pixel_width, pixel_height, zlib.compress(picture.tobytes()), width, height
+
+
+def _block_style(block):
+    if block['type'] == 'heading':
+        return HEADING_STYLES.get(block['level'], HEADING_STYLES[2])
+    style = PARAGRAPH_STYLE
+    if block['color'] is not None:
+        style = (style[0], style[1], block['color'], style[3], style[4])
+    return style
+
+
+def write_pdf(content, pdf_path):
+    pictures = {index: _load_picture(block['image'], block['width'])
+                for index, block in enumerate(content.blocks) if block['type'] == 'picture'}
+
+    layout = _PdfLayout()
+    for index, block in enumerate(content.blocks):
+        if block['type'] == 'picture':
+            layout.add_picture(pictures[index])
+            continue
+        # Headings stay on the same page as the first line or picture that follows them
+        keep_with_next = 0
+        if block['type'] == 'heading' and index + 1 < len(content.blocks):
+            next_block = content.blocks[index + 1]
+            if next_block['type'] == 'picture':
+                keep_with_next = pictures[index + 1][4]
+            else:
+                keep_with_next = _block_style(next_block)[1] * LINE_SPACING
+        layout.add_text(block['text'], _block_style(block), keep_with_next)
+
+    # Object numbers: 1 catalog, 2 page tree, then fonts, images and one page + content stream per page
+    objects = []
+
+    def add_object(body):
+        objects.append(body)
+        return len(objects)
+
+    add_object(b'<< /Type /Catalog /Pages 2 0 R >>')
+    add_object(None)  # page tree, filled in once the page objects are numbered
+
+    font_refs = []
+    for font, (base_font, _) in FONTS.items():
+        number = add_object(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                            % base_font.encode())
+        font_refs.append(b'/%s %d 0 R' % (font.encode(), number))
+
+    image_refs = []
+    for name, pixel_width, pixel_height, data in layout.images:
+        number = add_object(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                            b'/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream'
+                            % (pixel_width, pixel_height, len(data), data))
+        image_refs.append(b'/%s %d 0 R' % (name.encode(), number))
+
+    resources = b'<< /Font << %s >> /XObject << %s >> >>' % (b' '.join(font_refs), b' '.join(image_refs))
+    page_numbers = []
+    for operations in layout.pages:
+        stream = zlib.compress(b'\n'.join(operations))
+        content_number = add_object(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream'
+                                    % (len(stream), stream))
+        page_numbers.append(add_object(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s '
+                                       b'/Contents %d 0 R >>' % (PAGE_WIDTH, PAGE_HEIGHT, resources, content_number)))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % number for number in page_numbers), len(page_numbers))
+
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+        xref_offset = f.tell()
+        f.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b'%010d 00000 n \n' % offset)
+        f.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset))
+    return pdf_path
@@ -0,0 +1,43 @@
+import io
+
+from docx import Document
+from docx.shared import Inches
+from docx.shared import RGBColor
+
+
+class ReportContent:
+    # Ordered headings, paragraphs and pictures of a report. The DOCX and the PDF are
+    # both built from the same content, so neither has to be converted from the other.
+    def __init__(self):
+        self.blocks = []
+
+    def add_heading(self, text, level=1):
+        self.blocks.append({'type': 'heading', 'text': text, 'level': level})
+
+    def add_paragraph(self, text, color=None):
+        # color is an (r, g, b) tuple
+        self.blocks.append({'type': 'paragraph', 'text': text, 'color': color})
+
+    def add_picture(self, image, width=6):
+        # image is PNG/JPEG bytes, a file path or a file-like object, width is in inches
+        self.blocks.append({'type': 'picture', 'image': image, 'width': width})
+
+
+def picture_source(image):
+    # Something python-docx and PIL can both open; bytes get a fresh stream on every call
+    return io.BytesIO(image) if isinstance(image, bytes) else image
+
+
+def build_docx(content, docx_path):
+    doc = Document()
+    for block in content.blocks:
+        if block['type'] == 'heading':
+            doc.add_heading(block['text'], block['level'])
+        elif block['type'] == 'paragraph':
+            run = doc.add_paragraph().add_run(block['text'])
+            if block['color'] is not None:
+                run.font.color.rgb = RGBColor(*block['color'])
+        elif block['type'] == 'picture':
+            doc.add_picture(picture_source(block['image']), width=Inches(block['width']))
+    doc.save(docx_path)
+    return docx_path
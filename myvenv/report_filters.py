@@ -0,0 +1,66 @@
+from datetime import date
+
+from schema import AGE_LABELS
+
+# Filters a report can be restricted to (see cube.py). Parsing them needs no pandas, so
+# the web process can validate requests without loading the data stack.
+
+# Report filter names accepted by parse_report_filters, and the dimension they select on
+REPORT_FILTERS = {
+    'event_name': 'Event Name',
+    'event_type': 'Event Type',
+    'organizer': 'Event Organizer',
+    'ticket_type': 'Ticket Type',
+    'gender': 'Attendee Gender',
+    'age_group': 'Age Group',
+}
+GENDER_CODES = {'Male': 1, 'Female': 0}
+
+
+def parse_report_filters(params):
+    # Turns request parameters into cube filters: {dimension: [values]} plus an optional
+    # 'Event Date' (start, end) range. Raises ValueError for unknown names or bad values.
+    filters = {}
+    for name, value in params.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        values = [str(v).strip() for v in values if str(v).strip()]
+        if not values:
+            continue
+        if name in REPORT_FILTERS:
+            if name == 'gender':
+                unknown = [v for v in values if v not in GENDER_CODES]
+                if unknown:
+                    raise ValueError(f'Unknown gender: {", ".join(unknown)}')
+                values = [GENDER_CODES[v] for v in values]
+            elif name == 'age_group':
+                unknown = [v for v in values if v not in AGE_LABELS]
+                if unknown:
+                    raise ValueError(f'Unknown age group: {", ".join(unknown)}')
+            filters[REPORT_FILTERS[name]] = values
+        elif name in ('start_date', 'end_date'):
+            if len(values) > 1:
+                raise ValueError(f'{name} takes a single date')
+            try:
+                parsed = date.fromisoformat(values[0])
+            except ValueError:
+                raise ValueError(f'{name} must be a date in YYYY-MM-DD format') from None
+            start, end = filters.get('Event Date', (None, None))
+            filters['Event Date'] = (parsed, end) if name == 'start_date' else (start, parsed)
+        else:
+            raise ValueError(f'Unknown report filter: {name}')
+    return filters
+
+
+def describe_filters(filters):
+    # Human readable summary of the filters, for the report text
+    parts = []
+    for dimension, values in filters.items():
+        if dimension == 'Event Date':
+            start, end = values
+            parts.append(f'Event Date: {start or "any"} to {end or "any"}')
+        elif dimension == 'Attendee Gender':
+            names = {code: name for name, code in GENDER_CODES.items()}
+            parts.append(f'Attendee Gender: {", ".join(names[v] for v in values)}')
+        else:
+            parts.append(f'{dimension}: {", ".join(str(v) for v in values)}')
+    return '; '.join(parts)
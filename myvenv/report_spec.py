@@ -0,0 +1,236 @@
+# Declarative description of the report. Each section lists its parts in order; a part
+# has an optional level-2 heading, an optional chart and paragraph templates filled in
+# from values computed off the metrics. Charts and parts name the aggregations.py metrics
+# they read, so a report restricted to some sections only computes what those need.
+#
+# Only plain data and small functions over the metrics live here, so the web process can
+# validate section names without importing pandas or matplotlib.
+
+
+def _sorted(metric, column):
+    return lambda metrics: metrics[metric][column].sort_values(ascending=False)
+
+
+event_sales = _sorted('by_event_name', 'tickets')
+event_type_sales = _sorted('by_event_type', 'tickets')
+event_type_popularity = _sorted('by_event_type', 'rows')
+tickets_by_organizer = _sorted('by_organizer', 'tickets')
+avg_ticket_price_per_event = _sorted('by_event_name', 'avg_price')
+ticket_type_count = _sorted('by_ticket_type', 'rows')
+avg_event_duration = _sorted('by_event_type', 'avg_duration')
+
+# Chart name -> charts.py plot function, the metrics it draws and its arguments
+CHARTS = {
+    'total_ticket_sales_by_event': {
+        'plot': 'plot_total_ticket_sales_by_event',
+        'metrics': ['by_event_name'],
+        'args': lambda metrics: (event_sales(metrics),),
+    },
+    'tickets_sold_by_event_type': {
+        'plot': 'plot_tickets_sold_by_event_type',
+        'metrics': ['by_event_type'],
+        'args': lambda metrics: (event_type_sales(metrics),),
+    },
+    'event_type_popularity': {
+        'plot': 'plot_event_type_popularity',
+        'metrics': ['by_event_type'],
+        'args': lambda metrics: (event_type_popularity(metrics),),
+    },
+    'tickets_sold_by_organizer': {
+        'plot': 'plot_tickets_sold_by_organizer',
+        'metrics': ['by_organizer'],
+        'args': lambda metrics: (tickets_by_organizer(metrics),),
+    },
+    'ticket_sales_distribution_by_price': {
+        'plot': 'plot_ticket_sales_distribution_by_price',
+        'metrics': ['price_histogram'],
+        'args': lambda metrics: (metrics['price_histogram'],),
+    },
+    'avg_ticket_price_per_event': {
+        'plot': 'plot_avg_ticket_price_per_event',
+        'metrics': ['by_event_name'],
+        'args': lambda metrics: (avg_ticket_price_per_event(metrics),),
+    },
+    'ticket_type_distribution': {
+        'plot': 'plot_ticket_type_distribution',
+        'metrics': ['ticket_types_by_event_type', 'by_ticket_type'],
+        'args': lambda metrics: (metrics['ticket_types_by_event_type'], ticket_type_count(metrics)),
+    },
+    'avg_event_duration': {
+        'plot': 'plot_avg_event_duration',
+        'metrics': ['by_event_type'],
+        'args': lambda metrics: (avg_event_duration(metrics),),
+    },
+    'attendee_age_distribution': {
+        'plot': 'plot_attendee_age_distribution',
+        'metrics': ['age_summaries'],
+        'args': lambda metrics: (metrics['age_summaries'],),
+    },
+    'gender_distribution': {
+        'plot': 'plot_gender_distribution',
+        'metrics': ['gender_count', 'gender_by_event'],
+        'args': lambda metrics: (metrics['gender_count'], metrics['gender_by_event']),
+    },
+}
+
+
+def _part(heading=None, chart=None, paragraphs=(), metrics=(), values=None):
+    return {'heading': heading, 'chart': chart, 'paragraphs': list(paragraphs), 'metrics': list(metrics),
+            'values': values or (lambda metrics: {})}
+
+
+def _top(series_function, name, value):
+    def values(metrics):
+        series = series_function(metrics)
+        return {name: series.idxmax(), value: series.max()}
+    return values
+
+
+def _event_type_share(metrics):
+    popularity = event_type_popularity(metrics)
+    return {'most_popular_event_type': popularity.idxmax(),
+            'most_popular_event_type_percentage': popularity.max() / popularity.sum() * 100}
+
+
+def _price_range(metrics):
+    return {'price_range': f"LKR {metrics['min_price']:.2f} to LKR {metrics['max_price']:.2f}"}
+
+
+def _gender_shares(metrics):
+    gender_count = metrics['gender_count']
+    return {'male_percentage': gender_count.get(1, 0) / gender_count.sum() * 100,
+            'female_percentage': gender_count.get(0, 0) / gender_count.sum() * 100}
+
+
+def _insights(metrics):
+    by_event_type = metrics['by_event_type']
+    by_event_name = metrics['by_event_name']
+    events_by_month = metrics['events_by_month']
+    # Event organizer with the most events by event type
+    organizer_name, event_type = metrics['events_by_organizer_type'].idxmax()
+    sold_tickets_by_type = metrics['by_ticket_type']['distinct_tickets']
+    return {
+        'total_revenue': metrics['total_revenue'],
+        # Most popular event type and event (based on total attendees)
+        'popular_event_type': by_event_type['attendees'].idxmax(),
+        'popular_event_type_attendees': by_event_type['attendees'].max(),
+        'popular_event_type_revenue': by_event_type['revenue'].max(),
+        'popular_event': by_event_name['attendees'].idxmax(),
+        'popular_event_attendees': by_event_name['attendees'].max(),
+        'popular_event_revenue': by_event_name['revenue'].max(),
+        'active_month': events_by_month.idxmax(),
+        'active_month_events': events_by_month.max(),
+        'organizer_name': organizer_name,
+        'event_type': event_type,
+        # Most active location (where the most attendees are located), ties resolved like Series.mode
+        'active_location': metrics['location_counts'].sort_index().idxmax(),
+        'top_ticket_type': sold_tickets_by_type.idxmax(),
+        'top_ticket_type_sold': sold_tickets_by_type.max(),
+    }
+
+
+INSIGHT_METRICS = ['total_revenue', 'by_event_type', 'by_event_name', 'events_by_month', 'events_by_organizer_type',
+                   'location_counts', 'by_ticket_type']
+
+# Section name -> level-1 heading and parts, in report order
+SECTIONS = {
+    'event_performance': {
+        'heading': '1. Event Performance Analysis',
+        'parts': [
+            _part(chart='total_ticket_sales_by_event', metrics=['by_event_name'],
+                  values=_top(event_sales, 'top_event', 'top_event_tickets_sold'),
+                  paragraphs=['This bar chart depicts the total number of tickets sold for each event. The event with the highest number of tickets sold is {top_event} with {top_event_tickets_sold} tickets sold, indicating its significant popularity.']),
+            _part('1.2 Tickets Sold by Event Type', 'tickets_sold_by_event_type', metrics=['by_event_type'],
+                  values=_top(event_type_sales, 'top_event_type', 'top_event_type_tickets_sold'),
+                  paragraphs=['The bar chart presents the number of tickets sold for each event type. {top_event_type} has the highest number of tickets sold, indicating its strong popularity among attendees.']),
+            _part('1.3 Event Type Popularity', 'event_type_popularity', metrics=['by_event_type'],
+                  values=_event_type_share,
+                  paragraphs=['The pie chart shows the distribution of event types. {most_popular_event_type} is the most popular, accounting for {most_popular_event_type_percentage:.1f}% of events.']),
+            _part('1.4 Tickets Sold by Event Organizer', 'tickets_sold_by_organizer', metrics=['by_organizer'],
+                  values=_top(tickets_by_organizer, 'top_organizer', 'top_organizer_tickets_sold'),
+                  paragraphs=['The bar chart depicts the total number of tickets sold by each event organizer. {top_organizer} has sold the highest number of tickets.']),
+            _part('1.5 Ticket Sales Distribution by Price', 'ticket_sales_distribution_by_price',
+                  metrics=['min_price', 'max_price'], values=_price_range,
+                  paragraphs=['The histogram displays the distribution of ticket prices. The majority of tickets are priced between {price_range}. This suggests that the event organizers cater to a broad price range to attract diverse audiences.']),
+            _part('1.6 Average Ticket Price per Event', 'avg_ticket_price_per_event', metrics=['by_event_name'],
+                  values=_top(avg_ticket_price_per_event, 'highest_avg_price_event', 'highest_avg_price'),
+                  paragraphs=['The bar chart shows the average ticket price for each event. {highest_avg_price_event} has the highest average ticket price of LKR {highest_avg_price:.2f}.']),
+            _part('1.7 Ticket Type Distribution by Event Type', 'ticket_type_distribution',
+                  paragraphs=['The bar chart on the left shows the distribution of ticket types for each event type. The pie chart on the right shows the overall popularity of each ticket type.']),
+            _part('1.8 Average Event Duration by Event Type', 'avg_event_duration', metrics=['by_event_type'],
+                  values=_top(avg_event_duration, 'longest_duration_event_type', 'longest_duration'),
+                  paragraphs=['The bar chart shows the average duration of events for each event type. {longest_duration_event_type} has the longest average duration of {longest_duration:.1f} hours.']),
+        ],
+    },
+    'demographics': {
+        'heading': '2. Attendee Demographics Analysis',
+        'parts': [
+            _part('2.1 Attendee Age Distribution by Event Type', 'attendee_age_distribution',
+                  paragraphs=['The boxplot shows the distribution of attendee ages for each event type.  You can see the age range and any potential outliers for each event type.']),
+            _part('2.2 Gender Distribution', 'gender_distribution', metrics=['gender_count'], values=_gender_shares,
+                  paragraphs=['The pie chart shows the overall gender distribution of attendees. {male_percentage:.1f}% are male, while {female_percentage:.1f}% are female. The stacked bar chart provides a breakdown of gender distribution across different events, allowing for a more detailed analysis of audience composition.']),
+        ],
+    },
+    'insights': {
+        'heading': '3. Insights and Recommendations',
+        'parts': [
+            _part('Insights', metrics=INSIGHT_METRICS, values=_insights, paragraphs=[
+                '- Total Revenue from Ticket Sales:  LKR  {total_revenue:.2f}',
+                '- Most Popular Event Type:  {popular_event_type}',
+                '- Total Attendees for Most Popular Event Type:  {popular_event_type_attendees}',
+                '- Total Revenue for Most Popular Event Type:  LKR  {popular_event_type_revenue:.2f}',
+                '- Most Popular Event:  {popular_event}',
+                '- Total Attendees for Most Popular Event:  {popular_event_attendees}',
+                '- Total Revenue for Most Popular Event:  LKR  {popular_event_revenue:.2f}',
+                '- Most Active Month for Events:  {active_month} with {active_month_events} events',
+                '- Event Organizer with the Most Events in the  {event_type}  category:  {organizer_name}',
+                '- Most Active Location for Attendees:  {active_location}',
+                '- Ticket Type with the Most Sold Tickets:  {top_ticket_type} with {top_ticket_type_sold} tickets sold',
+            ]),
+            _part('Recommendations', metrics=INSIGHT_METRICS, values=_insights, paragraphs=[
+                '- Focus on promoting events in the {popular_event_type} category, as this event type has been the most popular in terms of attendees and revenue.',
+                '- Partner with {organizer_name} to organize more events in the {event_type} category, as they have consistently attracted a large audience.',
+                '- Consider offering different ticket types to cater to a wider range of attendee preferences. The {top_ticket_type} ticket type has been the most popular, but diversifying options can potentially increase sales.',
+                '- Implement strategies to attract attendees from {active_location}. This location has consistently yielded the most attendees, suggesting a strong potential market.',
+            ]),
+        ],
+    },
+}
+
+
+def parse_sections(value):
+    # Section names from a comma-separated string or a list of them, in report order. None
+    # or an empty value selects the whole report; unknown names, or a value of another
+    # type, raise ValueError.
+    if not value:
+        return None
+    items = [value] if isinstance(value, str) else value
+    if not isinstance(items, (list, tuple)) or not all(isinstance(item, str) for item in items):
+        raise ValueError('sections must be a comma-separated string or a list of section names')
+    names = [name for item in items for name in item.split(',')]
+    names = {name.strip() for name in names if name.strip()}
+    unknown = names - set(SECTIONS)
+    if unknown:
+        raise ValueError(f'Unknown report sections: {", ".join(sorted(unknown))}; '
+                         f'choose from {", ".join(SECTIONS)}')
+    return [name for name in SECTIONS if name in names] or None
+
+
+def selected_sections(sections=None):
+    return [(name, SECTIONS[name]) for name in (sections or SECTIONS)]
+
+
+def report_charts(sections=None):
+    # Names of the charts drawn in the selected sections, in report order
+    return [part['chart'] for _, section in selected_sections(sections) for part in section['parts'] if part['chart']]
+
+
+def required_metrics(sections=None):
+    # The aggregations.py metrics the selected sections read
+    metrics = set()
+    for _, section in selected_sections(sections):
+        for part in section['parts']:
+            metrics.update(part['metrics'])
+            if part['chart']:
+                metrics.update(CHARTS[part['chart']]['metrics'])
+    return sorted(metrics)
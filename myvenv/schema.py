@@ -0,0 +1,81 @@
+# Declared schema of Data/event.csv, applied while the file is read so that text columns
+# with few distinct values are stored as category codes and dates are parsed once with
+# an explicit format instead of being inferred.
+#
+# The data may also be split into partition files with the same columns (e.g. one export
+# per month), given as a directory of CSV files or a glob pattern.
+
+import glob
+import os
+
+DATE_FORMAT = '%m/%d/%Y'
+
+# Age Group column added by the cleaning steps
+AGE_BINS = [0, 18, 30, 50, 70, 100]
+AGE_LABELS = ['<18', '18-30', '30-50', '50-70', '70+']
+
+DATE_COLUMNS = ['Ticket Sales Start Date', 'Ticket Sales End Date', 'Event Date']
+
+CATEGORY_COLUMNS = [
+    'Ticket Type',
+    'Attendee Gender',
+    'Attendee Location',
+    'Check-in Status',
+    'Event Name',
+    'Event Type',
+    'Event Time',
+    'Event Description',
+    'Event Organizer',
+]
+
+EVENT_DTYPES = {
+    'Event ID': 'Int32',
+    'Ticket ID': 'Int64',
+    # Read as text: the cleaning steps turn values that aren't numbers into NaN rather
+    # than failing the whole load (see ingestion.prepare_events)
+    'Ticket Price': 'object',
+    'Ticket Availability': 'Int32',
+    'Attendee Name': 'object',
+    'Attendee Contact Information': 'object',
+    'Attendee Age': 'object',
+    'Event Duration': 'Int16',
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+}
+
+
+def read_event_csv(data_path, chunksize=None, columns=None):
+    # Returns a DataFrame, or an iterator of DataFrames when chunksize is given, of all
+    # columns or only the named ones.
+    # Dates that don't match DATE_FORMAT are left as text and coerced by the cleaning steps.
+    # pandas is imported here so the constants above can be used without it.
+    import pandas as pd
+    date_columns = [column for column in DATE_COLUMNS if columns is None or column in columns]
+    return pd.read_csv(data_path, dtype=EVENT_DTYPES, parse_dates=date_columns, date_format=DATE_FORMAT,
+                       chunksize=chunksize, usecols=columns)
+
+
+def is_partitioned(data_path):
+    return os.path.isdir(data_path) or glob.has_magic(data_path)
+
+
+def partition_paths(data_path):
+    # The CSV files behind data_path, in name order: every *.csv of a directory, the files
+    # matching a glob pattern, or the file itself
+    if os.path.isdir(data_path):
+        return sorted(glob.glob(os.path.join(data_path, '*.csv')))
+    if glob.has_magic(data_path):
+        return sorted(path for path in glob.glob(data_path) if os.path.isfile(path))
+    return [data_path]
+
+
+def data_version(data_path):
+    # Size and modification time of every partition file; changes whenever one of them is
+    # modified, added or removed. None when data_path doesn't exist.
+    versions = []
+    for path in partition_paths(data_path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        versions.append([path, stat.st_size, stat.st_mtime_ns])
+    return versions or None
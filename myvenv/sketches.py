@@ -0,0 +1,160 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Mergeable sketches, so chunks and partitions of the data can be summarized separately
+# and combined.
+#
+# HyperLogLog sketches give approximate distinct counts per group. A sketch is an array of
+# 2**precision one-byte registers; sketches of the same group merge by taking the
+# register-wise maximum, like the exact sets in aggregations.py. The relative standard
+# error of an estimate is about 1.04 / sqrt(2**precision), e.g. 1.6% at precision 12
+# (4 KB per group).
+#
+# Quantile digests (t-digest) give the quantiles of a numeric column. A digest is a sorted
+# series of centroid weights indexed by centroid mean, plus the exact min and max. While a
+# column has at most `compression` distinct values every value is its own centroid, the
+# digest is exact and its quantiles equal Series.quantile; beyond that, neighbouring
+# centroids are merged so that at most about compression / 2 remain, smallest near the
+# tails, which bounds both the size of the digest and the error of extreme quantiles.
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def precision_for_error(relative_error):
+    # Smallest precision whose standard error is at most relative_error
+    precision = math.ceil(2 * math.log2(1.04 / relative_error))
+    return min(MAX_PRECISION, max(MIN_PRECISION, precision))
+
+
+def standard_error(precision):
+    return 1.04 / math.sqrt(2 ** precision)
+
+
+def _bit_length(values):
+    # Bit length of each uint64, computed on 32-bit halves that float64 holds exactly
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        high_length = np.where(high > 0, np.floor(np.log2(high)) + 33, 0)
+        low_length = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+    return np.where(high_length > 0, high_length, low_length).astype(np.uint8)
+
+
+def _registers(group_codes, n_groups, hashes, precision):
+    # Register index from the top precision bits, rank from the leading zeros of the rest
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    rank = (rest_bits + 1 - _bit_length(rest)).astype(np.uint8)
+    registers = np.zeros(n_groups << precision, dtype=np.uint8)
+    np.maximum.at(registers, (group_codes << precision) + index, rank)
+    return registers.reshape(n_groups, 2 ** precision)
+
+
+def _as_series(registers, index):
+    return pd.Series(list(registers), index=index, dtype=object)
+
+
+def hash_values(values):
+    # 64-bit hashes of a column, stable across processes so sketches of chunks can be merged
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def group_sketches(df, key, column, precision, hashes=None):
+    # Series of register arrays, one per group of key, over the non-null values of column.
+    # Groups are indexed like df.groupby(key, observed=True). hashes are the column's
+    # hash_values, when already computed for another sketch.
+    grouped = df.groupby(key, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    keep = (codes >= 0) & df[column].notna().to_numpy()
+    hashes = hash_values(df[column]) if hashes is None else hashes
+    return _as_series(_registers(codes[keep], grouped.ngroups, hashes[keep], precision), grouped.size().index)
+
+
+def merge_sketches(left, right):
+    combined = pd.concat([left, right])
+    grouped = combined.groupby(level=list(range(combined.index.nlevels)), observed=True)
+    registers = np.zeros((grouped.ngroups, len(combined.iloc[0]) if len(combined) else 0), dtype=np.uint8)
+    if len(combined):
+        np.maximum.at(registers, grouped.ngroup().to_numpy(), np.stack(combined.to_numpy()))
+    return _as_series(registers, grouped.size().index)
+
+
+def estimate_distinct(sketches):
+    # Estimated distinct count per group, as int64 like the exact counts
+    if not len(sketches):
+        return pd.Series([], index=sketches.index, dtype='int64')
+    registers = np.stack(sketches.to_numpy()).astype(np.float64)
+    m = registers.shape[1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    estimate = alpha * m * m / np.exp2(-registers).sum(axis=1)
+    # Small cardinalities are estimated by linear counting of the empty registers
+    empty = (registers == 0).sum(axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(empty, 1))
+    estimate = np.where((estimate <= 2.5 * m) & (empty > 0), linear, estimate)
+    return pd.Series(np.rint(estimate).astype('int64'), index=sketches.index)
+
+
+def _digest(centroids, exact, minimum, maximum, compression):
+    centroids = centroids[centroids > 0].sort_index()
+    if len(centroids) > compression:
+        centroids = _compress(centroids, compression)
+        exact = False
+    return {'centroids': centroids, 'exact': exact, 'min': minimum, 'max': maximum}
+
+
+def _compress(centroids, compression):
+    # Merges neighbouring centroids whose starting quantile falls in the same unit of the
+    # t-digest scale function k(q) = compression / (2 pi) * asin(2q - 1)
+    weights = centroids.to_numpy(dtype=float)
+    means = centroids.index.to_numpy(dtype=float)
+    q_start = (np.cumsum(weights) - weights) / weights.sum()
+    bucket = np.floor(compression / (2 * np.pi) * np.arcsin(2 * q_start - 1))
+    merged = pd.DataFrame({'weight': weights, 'moment': weights * means}).groupby(bucket).sum()
+    return pd.Series(merged['weight'].to_numpy(), index=merged['moment'].to_numpy() / merged['weight'].to_numpy())
+
+
+def quantile_digest(values, compression):
+    # Digest of the non-null values of a numeric series
+    counts = values.value_counts()
+    counts.index = counts.index.astype(float)
+    minimum = counts.index.min() if len(counts) else np.nan
+    maximum = counts.index.max() if len(counts) else np.nan
+    return _digest(counts.astype(float), True, minimum, maximum, compression)
+
+
+def merge_digests(left, right, compression):
+    centroids = left['centroids'].add(right['centroids'], fill_value=0)
+    return _digest(centroids, left['exact'] and right['exact'], np.fmin(left['min'], right['min']),
+                   np.fmax(left['max'], right['max']), compression)
+
+
+def empty_digest():
+    return {'centroids': pd.Series(dtype=float), 'exact': True, 'min': np.nan, 'max': np.nan}
+
+
+def digest_quantile(digest, q):
+    # Quantile q of the digested values (NaN when there are none)
+    centroids = digest['centroids']
+    if not len(centroids):
+        return np.nan
+    means = centroids.index.to_numpy(dtype=float)
+    weights = centroids.to_numpy(dtype=float)
+    cumulative = np.cumsum(weights)
+    if digest['exact']:
+        # Linear interpolation between the two closest values, as Series.quantile does
+        position = (cumulative[-1] - 1) * q
+        lower_index = int(np.floor(position))
+        upper_index = int(np.ceil(position))
+        lower = means[np.searchsorted(cumulative, lower_index, side='right')]
+        upper = means[np.searchsorted(cumulative, upper_index, side='right')]
+        return lower + (upper - lower) * (position - lower_index)
+    # Interpolate between centroid centres, anchored at the exact min and max
+    centres = cumulative - weights / 2
+    positions = np.concatenate([[0], centres, [cumulative[-1]]])
+    values = np.concatenate([[digest['min']], means, [digest['max']]])
+    return float(np.interp(q * cumulative[-1], positions, values))
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+
+# Helpers shared by the on-disk caches (cleaned frame, cube, incremental state, partition
+# results, stored summaries, charts) and the published reports:
+# - code_version: the version of the code and settings a cache is computed with. Each
+#   cache records the version of what it depends on and is discarded when that changes.
+# - atomic_write: writes a file under a temporary name and renames it into place.
+# Only the standard library is used, so the web process can use them without pandas.
+
+SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that decide which rows the cleaned data holds and how they are typed
+CLEANING_SOURCES = ['schema.py', 'ingestion.py', 'sketches.py']
+# ...and the ones that aggregate them into the report metrics
+AGGREGATION_SOURCES = CLEANING_SOURCES + ['aggregations.py', 'binned_kde.py']
+
+# Environment settings that change the cleaned rows (the compression of the price digest
+# decides the outlier bounds), and the aggregates
+CLEANING_SETTINGS = ['REPORT_QUANTILE_COMPRESSION']
+AGGREGATION_SETTINGS = CLEANING_SETTINGS + ['REPORT_DISTINCT_MODE', 'REPORT_DISTINCT_ERROR']
+
+_versions = {}
+
+
+def code_version(sources, settings=()):
+    # Hash of the named source files (relative to this folder) and the values of the
+    # named environment settings
+    key = (tuple(sources), tuple(settings))
+    if key not in _versions:
+        digest = hashlib.sha256()
+        for name in sources:
+            with open(os.path.join(SOURCE_FOLDER, name), 'rb') as f:
+                digest.update(f.read())
+        for name in settings:
+            digest.update(f'{name}={os.environ.get(name, "")};'.encode())
+        _versions[key] = digest.hexdigest()[:16]
+    return _versions[key]
+
+
+@contextmanager
+def atomic_write(path):
+    # Yields a temporary path next to path (hidden, with the same extension) to write the
+    # file to. It replaces path in one step once the block completes, so readers never see
+    # a half-written file, and is removed if the block fails.
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f'.{uuid.uuid4().hex}.{name}')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
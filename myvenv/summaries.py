@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+from report_spec import SECTIONS
+from storage import AGGREGATION_SETTINGS, AGGREGATION_SOURCES, atomic_write, code_version as _code_version
+
+# JSON summaries of the report sections: the values the section texts quote (top event,
+# total revenue, most active month, ...), without rendering any chart or document. They
+# are stored on disk next to the version of the CSV they were computed from, so the web
+# process answers from the stored file until the CSV changes.
+#
+# Reading and validating a stored summary only needs json and os, so it runs in the web
+# process; computing one runs in a report worker (see jobs.get_summaries).
+
+SUMMARY_FOLDER = os.environ.get('REPORT_SUMMARY_FOLDER', 'Cache')
+
+# Stored summaries are discarded whenever the code that computes them changes
+SUMMARY_SOURCES = AGGREGATION_SOURCES + ['incremental.py', 'partitions.py', 'event_store.py', 'report_spec.py',
+                                         'summaries.py']
+# Settings that change the computed values
+SUMMARY_SETTINGS = AGGREGATION_SETTINGS
+
+
+def _summary_path(data_path):
+    prefix = hashlib.sha256(os.path.abspath(data_path).encode()).hexdigest()[:16]
+    return os.path.join(SUMMARY_FOLDER, f'summary_{prefix}.json')
+
+
+def code_version():
+    return _code_version(SUMMARY_SOURCES, SUMMARY_SETTINGS)
+
+
+def _plain(value):
+    # numpy scalars to the Python values json can write
+    return value.item() if hasattr(value, 'item') else value
+
+
+def section_summary(metrics, name):
+    # The values quoted in the text of section name, as a JSON-ready dict
+    summary = {}
+    for part in SECTIONS[name]['parts']:
+        summary.update({key: _plain(value) for key, value in part['values'](metrics).items()})
+    return summary
+
+
+def compute_summaries(data_path, chunksize=None, incremental=False, partition_workers=None):
+    # Summaries of every section, computed from the report metrics
+    from report_generator import load_metrics
+    metrics = load_metrics(data_path, chunksize=chunksize, incremental=incremental,
+                           partition_workers=partition_workers)
+    return {name: section_summary(metrics, name) for name in SECTIONS}
+
+
+def load_stored_summaries(data_path, data_version):
+    # The stored summaries of data_path if they were computed from data_version of the
+    # CSV by the current code, else None
+    try:
+        with open(_summary_path(data_path)) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get('data_version') != data_version or stored.get('code_version') != code_version():
+        return None
+    return stored['sections']
+
+
+def store_summaries(data_path, data_version, sections):
+    os.makedirs(SUMMARY_FOLDER, exist_ok=True)
+    with atomic_write(_summary_path(data_path)) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump({'data_version': data_version, 'code_version': code_version(), 'sections': sections}, f)
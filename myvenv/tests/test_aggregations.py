@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregations import compute_metrics
+from ingestion import load_events, stream_metrics
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'event.csv')
+
+
+def assert_same_metric(expected, actual, name):
+    if isinstance(expected, (pd.Series, pd.DataFrame)):
+        expected = pd.DataFrame(expected).sort_index()
+        actual = pd.DataFrame(actual).sort_index()
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                      check_categorical=False, check_column_type=False, obj=name)
+    elif isinstance(expected, dict):
+        assert list(expected) == list(actual), name
+        for key in expected:
+            assert_same_metric(expected[key], actual[key], f'{name}[{key!r}]')
+    elif isinstance(expected, (np.ndarray, list, tuple)):
+        np.testing.assert_allclose(np.asarray(expected, dtype=float), np.asarray(actual, dtype=float), err_msg=name)
+    elif isinstance(expected, str):
+        assert expected == actual, name
+    else:
+        np.testing.assert_allclose(expected, actual, err_msg=name)
+
+
+def assert_same_metrics(expected, actual):
+    assert list(expected) == list(actual)
+    for name in expected:
+        assert_same_metric(expected[name], actual[name], name)
+
+
+def test_chunked_metrics_match_whole_frame(tmp_path):
+    # Duplicated rows across chunks exercise the cross-chunk dedup
+    rows = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    path = tmp_path / 'event.csv'
+    pd.concat([rows, rows.iloc[:300]]).to_csv(path, index=False)
+
+    expected = compute_metrics(load_events(str(path)))
+    assert_same_metrics(expected, stream_metrics(str(path), chunksize=500))
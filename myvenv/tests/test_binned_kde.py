@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from binned_kde import box_summaries
+
+
+def test_box_summaries_match_boxplot_stats():
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame({'group': rng.choice(['a', 'b', 'c'], 3000),
+                         'age': np.concatenate([rng.integers(18, 70, 2990), rng.integers(90, 100, 10)])})
+    summaries = box_summaries(rows.groupby(['group', 'age']).size())
+    assert list(summaries) == ['a', 'b', 'c']
+    for group, ages in rows.groupby('group')['age']:
+        expected = boxplot_stats(ages.to_numpy(dtype=float))[0]
+        summary = summaries[group]
+        for key in ['q1', 'med', 'q3', 'whislo', 'whishi']:
+            assert summary[key] == pytest.approx(expected[key]), key
+        # Each outlying value is drawn once, however many rows have it
+        assert list(summary['fliers']) == sorted(set(expected['fliers']))
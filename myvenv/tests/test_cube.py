@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from aggregations import compute_metrics
+from cube import build_cube, filtered_metrics
+from ingestion import load_events
+from report_filters import parse_report_filters
+from test_aggregations import DATA_PATH, assert_same_metrics
+
+
+@pytest.fixture(scope='module')
+def events():
+    return load_events(DATA_PATH)
+
+
+def filter_rows(df, filters):
+    for column, values in filters.items():
+        if column == 'Event Date':
+            start, end = values
+            df = df[(df['Event Date'] >= pd.Timestamp(start)) & (df['Event Date'] <= pd.Timestamp(end))]
+        else:
+            df = df[df[column].isin(values)]
+    return df
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'event_type': 'Seminar'},
+    {'organizer': ['Fischer-Green', 'Owens Group']},
+    {'start_date': '2024-08-01', 'end_date': '2024-08-31'},
+    {'gender': 'Female', 'age_group': '30-50'},
+])
+def test_cube_slice_matches_filtered_rows(events, params):
+    filters = parse_report_filters(params)
+    assert_same_metrics(compute_metrics(filter_rows(events, filters)), filtered_metrics(build_cube(events), filters))
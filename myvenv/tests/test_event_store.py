@@ -0,0 +1,37 @@
+import pytest
+
+from aggregations import compute_metrics
+from event_store import ingest_events, store_metrics
+from ingestion import load_events
+from report_filters import parse_report_filters
+from test_aggregations import DATA_PATH, assert_same_metrics
+from test_cube import filter_rows
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    store_path = str(tmp_path_factory.mktemp('store') / 'events.sqlite')
+    assert ingest_events(DATA_PATH, store_path) == len(load_events(DATA_PATH))
+    return store_path
+
+
+@pytest.fixture(scope='module')
+def events():
+    return load_events(DATA_PATH)
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'event_type': 'Seminar'},
+    {'organizer': ['Fischer-Green', 'Owens Group']},
+    {'start_date': '2024-08-01', 'end_date': '2024-08-31'},
+    {'gender': 'Female', 'age_group': '30-50'},
+])
+def test_store_metrics_match_filtered_rows(store, events, params):
+    filters = parse_report_filters(params)
+    assert_same_metrics(compute_metrics(filter_rows(events, filters)), store_metrics(store, filters))
+
+
+def test_filters_matching_no_rows_are_rejected(store):
+    with pytest.raises(ValueError):
+        store_metrics(store, parse_report_filters({'organizer': 'No Such Organizer'}))
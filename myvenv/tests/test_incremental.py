@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+import incremental
+from aggregations import compute_metrics
+from ingestion import load_events
+from test_aggregations import DATA_PATH, assert_same_metrics
+
+
+@pytest.fixture
+def state_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, 'INCREMENTAL_STATE_FOLDER', str(tmp_path / 'state'))
+
+
+def test_header_only_file_has_empty_metrics(tmp_path, state_folder):
+    path = tmp_path / 'event.csv'
+    with open(DATA_PATH, 'rb') as f:
+        path.write_bytes(f.readline())
+    assert_same_metrics(compute_metrics(load_events(str(path))), incremental.incremental_metrics(str(path)))
+    assert incremental.incremental_metrics(str(path))['total_revenue'] == 0
+
+
+def write_rows(path, lines, mtime_ns=None):
+    path.write_bytes(b''.join(lines))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def expected_metrics(path):
+    return compute_metrics(load_events(str(path)))
+
+
+def test_appended_rows_are_merged(tmp_path, state_folder):
+    with open(DATA_PATH, 'rb') as f:
+        lines = f.readlines()
+    path = tmp_path / 'event.csv'
+    write_rows(path, lines[:2001])
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path), chunksize=700))
+    # Appended rows, including some duplicates of earlier ones and a row still being written
+    with open(path, 'ab') as f:
+        f.write(b''.join(lines[2001:3000] + lines[10:20]))
+        f.write(lines[3000][:15])
+    complete = tmp_path / 'complete.csv'
+    write_rows(complete, lines[:3000] + lines[10:20])
+    assert_same_metrics(expected_metrics(complete), incremental.incremental_metrics(str(path)))
+
+    with open(path, 'ab') as f:
+        f.write(lines[3000][15:])
+        f.write(b''.join(lines[3001:]))
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path)))
+
+
+def test_last_row_without_newline_counts_once_the_file_is_unchanged(tmp_path, state_folder):
+    with open(DATA_PATH, 'rb') as f:
+        lines = f.readlines()
+    path = tmp_path / 'event.csv'
+    write_rows(path, lines[:1000] + [lines[1000].rstrip(b'\r\n')])
+    first = incremental.incremental_metrics(str(path))
+    without_last = tmp_path / 'without_last.csv'
+    write_rows(without_last, lines[:1000])
+    assert_same_metrics(expected_metrics(without_last), first)
+    # Same size and mtime at the next run: the row is complete
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path)))
+    # The row is continued afterwards: everything is read again
+    with open(path, 'ab') as f:
+        f.write(b'\n' + b''.join(lines[1001:1500]))
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path)))
+
+
+def test_edit_before_the_checkpoint_rebuilds(tmp_path, state_folder):
+    with open(DATA_PATH, 'rb') as f:
+        lines = f.readlines()
+    path = tmp_path / 'event.csv'
+    write_rows(path, lines)
+    stat = path.stat()
+    incremental.incremental_metrics(str(path))
+    # Same length, same size and mtime, early in the file
+    fields = lines[5].split(b',')
+    fields[3] = b'9' * len(fields[3])
+    write_rows(path, lines[:5] + [b','.join(fields)] + lines[6:], stat.st_mtime_ns)
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path)))
+
+
+def test_rows_that_move_the_price_bounds_rebuild(tmp_path, state_folder):
+    with open(DATA_PATH, 'rb') as f:
+        lines = f.readlines()
+    path = tmp_path / 'event.csv'
+    write_rows(path, lines[:1500])
+    incremental.incremental_metrics(str(path))
+    # Much dearer tickets move the IQR bounds, and ages without a value change the fill
+    fields = lines[1500].split(b',')
+    fields[3] = b'250000'
+    fields[9] = b''
+    with open(path, 'ab') as f:
+        f.write(b''.join([b','.join(fields)] * 1 + lines[1501:3500]))
+    assert_same_metrics(expected_metrics(path), incremental.incremental_metrics(str(path)))
@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+
+from aggregations import compute_metrics
+from ingestion import load_events, stream_metrics
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'event.csv')
+
+
+def test_values_that_are_not_numbers_become_nan(tmp_path):
+    rows = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    rows.loc[3, 'Ticket Price'] = 'free'
+    rows.loc[7, 'Attendee Age'] = 'unknown'
+    path = tmp_path / 'event.csv'
+    rows.to_csv(path, index=False)
+
+    df = load_events(str(path))
+    assert len(df) == len(rows)
+    assert df['Ticket Price'].isna().sum() == 1
+    assert compute_metrics(df)['total_revenue'] == stream_metrics(str(path), chunksize=500)['total_revenue']
+
+
+def test_duplicates_are_dropped_across_chunks_with_and_without_missing_ages(tmp_path):
+    rows = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    # The second chunk repeats the first, and has missing ages of its own
+    copy = rows.iloc[:500].copy()
+    copy.iloc[::5, copy.columns.get_loc('Attendee Age')] = ''
+    path = tmp_path / 'event.csv'
+    pd.concat([rows.iloc[:500], copy]).to_csv(path, index=False)
+
+    expected = compute_metrics(load_events(str(path)))
+    assert stream_metrics(str(path), chunksize=500)['by_event_name']['tickets'].sum() == \
+        expected['by_event_name']['tickets'].sum()
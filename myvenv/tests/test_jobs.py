@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+
+import jobs
+
+
+def _no_warm_up():
+    pass
+
+
+def _fake_report(job_id, filters=None, sections=None):
+    return f'{job_id}.pdf', []
+
+
+def _slow_report(job_id, filters=None, sections=None):
+    time.sleep(1)
+    return _fake_report(job_id, filters, sections)
+
+
+def _crash(job_id, filters=None, sections=None):
+    os._exit(1)
+
+
+@pytest.fixture
+def job_queue(monkeypatch):
+    # Report jobs run in real worker processes, with a stand-in for generate_report
+    monkeypatch.setattr(jobs, '_warm_worker', _no_warm_up)
+    monkeypatch.setattr(jobs, '_run_report_job', _fake_report)
+    monkeypatch.setattr(jobs, '_data_version', lambda: None)
+    jobs._jobs.clear()
+    yield jobs
+    if jobs._executor is not None:
+        jobs._executor.shutdown()
+    jobs._executor = None
+    jobs._jobs.clear()
+
+
+def wait_for(job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get_job(job_id)
+        if job['status'] in ('finished', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_latest_finished_job_is_a_full_report(job_queue):
+    full = job_queue.submit_report_job()
+    wait_for(full)
+    wait_for(job_queue.submit_report_job({'event_type': ['Seminar']}))
+    wait_for(job_queue.submit_report_job(None, ['demographics']))
+    assert job_queue.latest_finished_job()['id'] == full
+
+    every_section = job_queue.submit_report_job(None, list(jobs.SECTIONS))
+    wait_for(every_section)
+    assert job_queue.latest_finished_job()['id'] == every_section
+
+
+def test_identical_requests_share_a_job(job_queue, monkeypatch):
+    monkeypatch.setattr(jobs, '_run_report_job', _slow_report)
+    job_id = job_queue.submit_report_job({'event_type': ['Seminar']})
+    assert job_queue.submit_report_job({'event_type': ['Seminar']}) == job_id
+    assert job_queue.submit_report_job({'event_type': ['Conference']}) != job_id
+    assert job_queue.get_job(job_id)['requests'] == 2
+    assert wait_for(job_id)['status'] == 'finished'
+    # A finished job is not joined
+    assert job_queue.submit_report_job({'event_type': ['Seminar']}) != job_id
+
+
+def test_jobs_run_again_after_a_worker_dies(job_queue, monkeypatch):
+    monkeypatch.setattr(jobs, '_run_report_job', _crash)
+    crashed = wait_for(job_queue.submit_report_job())
+    assert crashed['status'] == 'failed'
+    assert crashed['error'] == 'A report worker process stopped unexpectedly'
+
+    monkeypatch.setattr(jobs, '_run_report_job', _fake_report)
+    assert wait_for(job_queue.submit_report_job())['status'] == 'finished'
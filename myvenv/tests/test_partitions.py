@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import partitions
+from aggregations import compute_metrics
+from ingestion import load_events
+from test_aggregations import DATA_PATH, assert_same_metrics
+
+
+@pytest.fixture
+def partition_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(partitions, 'PARTITION_CACHE_FOLDER', str(tmp_path / 'cache'))
+    folder = tmp_path / 'parts'
+    folder.mkdir()
+    rows = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    # Overlapping partitions, so rows of a later one are already held by an earlier one
+    rows.iloc[:1800].to_csv(folder / 'a.csv', index=False)
+    rows.iloc[1500:3200].to_csv(folder / 'b.csv', index=False)
+    return folder, rows
+
+
+def test_partitioned_metrics_match_concatenated_files(partition_folder):
+    folder, _ = partition_folder
+    expected = compute_metrics(load_events(str(folder)))
+    assert_same_metrics(expected, partitions.partitioned_metrics(str(folder), max_workers=2))
+    # Read back from the cache, streamed in chunks
+    assert_same_metrics(expected, partitions.partitioned_metrics(str(folder), chunksize=400, max_workers=1))
+    assert_same_metrics(expected, partitions.partitioned_metrics(str(folder / '*.csv'), max_workers=1))
+
+
+def test_added_partition_matches_concatenated_files(partition_folder):
+    folder, rows = partition_folder
+    partitions.partitioned_metrics(str(folder), max_workers=1)
+    # The new partition has missing ages and repeats rows of an earlier one
+    added = rows.iloc[3000:].copy()
+    added.iloc[::5, added.columns.get_loc('Attendee Age')] = ''
+    added.to_csv(folder / 'c.csv', index=False)
+    assert_same_metrics(compute_metrics(load_events(str(folder))),
+                        partitions.partitioned_metrics(str(folder), max_workers=1))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import (digest_quantile, estimate_distinct, group_sketches, merge_digests, merge_sketches,
+                      precision_for_error, quantile_digest, standard_error)
+
+
+@pytest.mark.parametrize('distinct', [100, 5_000, 100_000])
+def test_hll_estimate_within_error_bounds(distinct):
+    precision = precision_for_error(0.02)
+    df = pd.DataFrame({'group': 'a', 'value': np.arange(distinct).astype(str)})
+    estimate = estimate_distinct(group_sketches(df, 'group', 'value', precision))['a']
+    # Within four standard errors
+    assert abs(estimate - distinct) <= 4 * standard_error(precision) * distinct
+
+
+def test_merged_sketches_match_sketch_of_all_rows():
+    precision = precision_for_error(0.02)
+    df = pd.DataFrame({'group': np.repeat(['a', 'b'], 3000), 'value': np.arange(6000) % 2500})
+    merged = merge_sketches(group_sketches(df[:2000], 'group', 'value', precision),
+                            group_sketches(df[2000:], 'group', 'value', precision))
+    whole = group_sketches(df, 'group', 'value', precision)
+    pd.testing.assert_series_equal(estimate_distinct(merged), estimate_distinct(whole))
+
+
+@pytest.mark.parametrize('q', [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1])
+def test_exact_digest_quantile_matches_series_quantile(q):
+    values = pd.Series(np.random.default_rng(0).integers(0, 50, 1000), dtype=float)
+    digest = quantile_digest(values, compression=200)
+    assert digest['exact']
+    assert digest_quantile(digest, q) == pytest.approx(values.quantile(q))
+
+
+def test_merged_digests_match_digest_of_all_values():
+    values = pd.Series(np.random.default_rng(1).integers(0, 100, 2000), dtype=float)
+    merged = merge_digests(quantile_digest(values[:700], 200), quantile_digest(values[700:], 200), 200)
+    for q in [0.25, 0.5, 0.75]:
+        assert digest_quantile(merged, q) == pytest.approx(values.quantile(q))
+
+
+def test_compressed_digest_quantiles_are_close():
+    values = pd.Series(np.random.default_rng(2).normal(100, 15, 50_000))
+    digest = quantile_digest(values, compression=200)
+    assert not digest['exact']
+    for q in [0.25, 0.5, 0.75]:
+        assert digest_quantile(digest, q) == pytest.approx(values.quantile(q), rel=0.01)